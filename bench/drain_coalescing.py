@@ -0,0 +1,109 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.parse import classify_line, classify_lines
+from utils.tail import LogTail
+
+# usage: python bench/drain_coalescing.py [lines] [writes_per_drain ...]
+#
+# sshd appends one line per write. The original handler reopened auth.log on
+# every modification event; the drain loop keeps it open and reads whatever
+# piled up since the last pass. Only the reader side is measured.
+
+LINES = [
+    "May  1 12:00:00 host sshd[{i}]: Failed password for root from 10.0.{a}.{b} port {i} ssh2\n",
+    "May  1 12:00:00 host sshd[{i}]: Connection closed by 10.0.{a}.{b} port {i}\n",
+    "May  1 12:00:00 host CRON[{i}]: pam_unix(cron:session): session opened for user root\n",
+]
+
+
+def read_syscalls():
+    # read(2)-family calls made by this process so far (Linux only)
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["syscr"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def measurement_overhead():
+    # reads done by read_syscalls() itself, subtracted from every sample
+    before = read_syscalls()
+    return read_syscalls() - before if before is not None else 0
+
+
+class OpenPerEvent:
+    # the handler before the drain loop: open, seek, readlines, close per event
+    def __init__(self, path):
+        self.path = path
+        with open(path, "r") as f:
+            f.seek(0, 2)
+            self.last_size = f.tell()
+        self.opens = 0
+
+    def on_modified(self):
+        self.opens += 1
+        with open(self.path, "r") as f:
+            f.seek(self.last_size)
+            new_lines = f.readlines()
+            self.last_size = f.tell()
+            for line in new_lines:
+                classify_line(line.strip())
+
+
+class Drain:
+    def __init__(self, path):
+        self.tail = LogTail(path)
+        self.opens = 1
+
+    def on_modified(self):
+        data = self.tail.read()
+        if data:
+            classify_lines(data.decode("utf-8", "replace").split("\n"))
+
+
+def run(reader_class, lines, writes_per_drain):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "auth.log")
+        open(path, "w").close()
+        reader = reader_class(path)
+        overhead = measurement_overhead()
+        cpu = 0.0
+        syscalls = 0
+        calls = 0
+        with open(path, "a", buffering=1) as log:
+            for i in range(lines):
+                log.write(LINES[i % len(LINES)].format(i=i, a=i % 251, b=i % 13))
+                if (i + 1) % writes_per_drain and i + 1 < lines:
+                    continue
+                before, start = read_syscalls(), time.process_time()
+                reader.on_modified()
+                cpu += time.process_time() - start
+                if before is not None:
+                    syscalls += read_syscalls() - before - overhead
+                calls += 1
+        return cpu, syscalls, calls, reader.opens
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    batches = [int(n) for n in sys.argv[2:]] or [1, 10, 100]
+    scale = 100000 / lines
+
+    print(f"{lines} lines, figures per 100k lines (reads counted from /proc/self/io)")
+    print(f"{'reader':<16} {'writes/drain':>12} {'drains':>8} {'opens':>8} {'read calls':>10} {'CPU s':>7}")
+    for name, reader_class, per_drain in [("open-per-event", OpenPerEvent, [1])] + [("drain", Drain, batches)]:
+        for writes_per_drain in per_drain:
+            cpu, syscalls, calls, opens = run(reader_class, lines, writes_per_drain)
+            print(f"{name:<16} {writes_per_drain:>12} {calls * scale:>8.0f} {opens * scale:>8.0f} "
+                  f"{syscalls * scale:>10.0f} {cpu * scale:>7.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.parallel import ParallelClassifier
+from utils.parse import classify_lines
+
+# usage: python bench/parallel_scaling.py [max_workers] [megabytes]
+
+LINES = [
+    "May  1 12:00:00 host sshd[{pid}]: Accepted publickey for alice from 10.0.{a}.{b} port {port} ssh2",
+    "May  1 12:00:00 host sshd[{pid}]: Failed password for root from 192.0.{a}.{b} port {port} ssh2",
+    "May  1 12:00:00 host sshd[{pid}]: Connection closed by 203.0.{a}.{b} port {port}",
+    "May  1 12:00:00 host CRON[{pid}]: pam_unix(cron:session): session opened for user root",
+    "May  1 12:00:00 host systemd[1]: Started Session {pid} of user alice.",
+]
+
+
+def make_log(size):
+    rng = random.Random(0)
+    lines, total = [], 0
+    while total < size:
+        line = rng.choice(LINES).format(pid=rng.randint(100, 99999), a=rng.randint(0, 255),
+                                        b=rng.randint(0, 255), port=rng.randint(1024, 65535))
+        lines.append(line)
+        total += len(line) + 1
+    return ("\n".join(lines) + "\n").encode()
+
+
+def best_of(fn, runs=3):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    size = int(float(sys.argv[2]) * 1024 * 1024) if len(sys.argv) > 2 else 32 * 1024 * 1024
+    data = make_log(size)
+
+    baseline, expected = best_of(lambda: classify_lines(data.decode().split("\n")))
+    print(f"{len(data) / 1024 / 1024:.1f} MiB, {len(expected)} matching lines")
+    print(f"{'workers':>7}  {'seconds':>8}  {'MiB/s':>8}  {'speedup':>7}  {'efficiency':>10}")
+    print(f"{'seq':>7}  {baseline:>8.3f}  {len(data) / 1024 / 1024 / baseline:>8.1f}  {1:>7.2f}  {'-':>10}")
+
+    for workers in range(1, max_workers + 1):
+        classifier = ParallelClassifier(workers=workers).start()
+        try:
+            elapsed, result = best_of(lambda: classifier.classify(data))
+        finally:
+            classifier.close()
+        if result != expected:
+            print(f"⚠️ {workers} worker(s) returned different results")
+            return 1
+        speedup = baseline / elapsed
+        print(f"{workers:>7}  {elapsed:>8.3f}  {len(data) / 1024 / 1024 / elapsed:>8.1f}  "
+              f"{speedup:>7.2f}  {speedup / workers:>10.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.events import make_event, LOGIN_FAILED, LOGIN_SUCCESS
+from utils.store import EventStore
+
+# usage: python bench/store_ingest.py [events] [batch_size ...]
+
+
+def make_events(count):
+    events = []
+    for i in range(count):
+        if i % 10:
+            event = make_event(LOGIN_FAILED, f"10.{i % 7}.{i % 251}.{i % 13}", 40000 + i % 20000,
+                               f"user{i % 500}", reason="Failed password")
+        else:
+            event = make_event(LOGIN_SUCCESS, f"192.168.1.{i % 250}", 50000, "alice", method="publickey")
+        events.append(event)
+    return events
+
+
+def run(events, batch_size):
+    with tempfile.TemporaryDirectory() as directory:
+        store = EventStore(os.path.join(directory, "events.db"), batch_size=batch_size,
+                           flush_interval=0.1, queue_size=len(events)).start()
+        start = time.perf_counter()
+        for event in events:
+            store.append(event)
+        appended = time.perf_counter() - start
+        while store.written + store.dropped < len(events):
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        store.stop()
+        return appended, elapsed, store.dropped
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    batch_sizes = [int(size) for size in sys.argv[2:]] or [1, 50, 500, 5000]
+    events = make_events(count)
+
+    print(f"{count} events")
+    print(f"{'batch':>6}  {'append µs/event':>15}  {'seconds':>8}  {'inserts/s':>10}  {'dropped':>7}")
+    for batch_size in batch_sizes:
+        appended, elapsed, dropped = run(events, batch_size)
+        print(f"{batch_size:>6}  {appended / count * 1e6:>15.2f}  {elapsed:>8.2f}  "
+              f"{count / elapsed:>10.0f}  {dropped:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
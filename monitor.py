@@ -2,9 +2,23 @@ import os
 import sys
 
 import yaml
-import re
+import html
 import time
-from utils.alerts import send_email
+import threading
+import multiprocessing
+import faulthandler
+import signal
+from utils.alerts import send_alert, get_sinks, stop_sinks, alert_stats
+from utils.events import make_event, SESSION_CLOSE, LOGIN_SUCCESS, LOGIN_FAILED, MULTIPLE_FAILURES, SKETCH_RULE, GEO_RULE
+from utils.store import EventStore, query_main
+from utils.history import IPHistory, summarize
+from utils.tail import LogTail
+from utils.output import EventWriter
+from utils.parse import classify_line, classify_lines
+from utils.parallel import ParallelClassifier
+from utils.sketches import SketchAnalytics
+from utils.geoip import GeoIPDatabase, GeoAggregator, build_database, describe
+from utils.control import ControlServer, ctl_main
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from config.setup_config import load_config, CONFIG_FILE
@@ -17,17 +31,6 @@ config = load_config()
 
 AUTH_LOG = config.get("auth_log", "/var/log/auth.log")
 
-# regex patterns
-SUCCESS_REGEX = re.compile(
-    r"Accepted (password|publickey|keyboard-interactive) for (\S+) from ([\d\.]+) port (\d+)"
-)
-FAIL_REGEX = re.compile(
-    r"(Failed password|Invalid user) for (\S+) from ([\d\.]+) port (\d+)"
-)
-CLOSE_REGEX = re.compile(
-    r"(Disconnected from|Connection closed by).*?([\d\.]+) port (\d+)"
-)
-
 # active sessions tracking
 active_sessions = set()
 
@@ -36,8 +39,101 @@ failed_attempts = {}
 FAIL_THRESHOLD = 5    
 TIME_WINDOW = 60     
 
+# recent successes and usernames per IP, for critical alerts
+ip_history = IPHistory(**config.get("history", {}))
+
+# fixed-memory distinct counts (spraying / distributed attacks), off unless configured
+sketch_cfg = config.get("sketches")
+try:
+    sketches = SketchAnalytics(**sketch_cfg) if sketch_cfg else None
+except ValueError as e:
+    sys.exit(f"Invalid sketches config: {e}")
+
+# offline GeoIP / ASN enrichment, off unless a database is configured
+geoip_cfg = dict(config.get("geoip", {}))
+try:
+    geo_rules = GeoAggregator(geoip_cfg.pop("rules", []))
+except ValueError as e:
+    sys.exit(f"Invalid geoip config: {e}")
+geoip = None
+if geoip_cfg.get("database"):
+    try:
+        geoip = GeoIPDatabase(os.path.expanduser(geoip_cfg.pop("database")), **geoip_cfg)
+    except (OSError, ValueError) as e:
+        # stderr: with `output.target: stdout`, stdout carries only event records
+        print(f"⚠️ GeoIP lookups disabled: {e}", file=sys.stderr)
+
+
+def geo_lookup(ip):
+    return geoip.lookup(ip) if geoip else None
+
+
+# runtime introspection socket, off unless configured
+control_cfg = config.get("control", {})
+CONTROL_SOCKET = os.path.expanduser(control_cfg["socket"]) if control_cfg.get("socket") else None
+
+
+def runtime_stats():
+    # copies first, the parser thread keeps mutating these
+    attempts = list(failed_attempts.values())
+    stats = {
+        "active_sessions": len(active_sessions),
+        "failed_attempts": {"ips": len(attempts), "timestamps": sum(map(len, attempts))},
+        "ip_history": len(ip_history.entries),
+        "alerts": alert_stats(),
+        "threads": [thread.name for thread in threading.enumerate()],
+    }
+    try:
+        with open("/proc/self/statm") as f:
+            stats["rss_kib"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        pass
+    if event_store:
+        stats["event_store"] = {"queued": event_store.queue.qsize(), "written": event_store.written,
+                                "dropped": event_store.dropped}
+    if event_output:
+        stats["event_output"] = {"buffered_bytes": event_output.buffered, "written_bytes": event_output.written,
+                                 "dropped": event_output.dropped}
+    if sketches:
+        stats["sketches"] = {"users": len(sketches.ips_per_user.keys), "ips": len(sketches.users_per_ip.keys)}
+    if geoip:
+        stats["geoip_cache"] = geoip.lookup.cache_info()._asdict()
+    return stats
+
+
+# log watching: "inotify" uses watchdog events, "poll" only polls every max_latency seconds
+watch_cfg = dict(config.get("watch", {}))
+WATCH_MODE = watch_cfg.pop("mode", "inotify")
+
+# optional multi-process classification of large drains (catch-up bursts)
+parallel_cfg = config.get("parallel", {})
+classifier = ParallelClassifier(**parallel_cfg) if parallel_cfg.get("workers", 0) > 1 else None
+
+# on-disk event history
+store_cfg = dict(config.get("store", {}))
+STORE_ENABLED = store_cfg.pop("enabled", True)
+STORE_PATH = os.path.expanduser(store_cfg.pop("path", os.path.join(os.path.dirname(CONFIG_FILE), "events.db")))
+event_store = None
+
+# structured event stream for downstream pipelines, off unless configured
+output_cfg = config.get("output")
+event_output = None
+
+
+def record_event(event):
+    if event_store:
+        event_store.append(event)
+    if event_output:
+        event_output.write(event)
+
 # success login
-def build_success_email(user, ip, port, method):
+def build_success_email(user, ip, port, method, location=None):
+    origin_row = f"""
+                <div class="info-row">
+                    <span class="info-label">Origin</span>
+                    <span class="info-value">{html.escape(location)}</span>
+                </div>""" if location else ""
+
     return f"""
 <!DOCTYPE html>
 <html lang="en">
@@ -218,7 +314,7 @@ def build_success_email(user, ip, port, method):
                 <div class="info-row">
                     <span class="info-label">Source IP</span>
                     <span class="info-value"><span class="ip-block">{ip}</span></span>
-                </div>
+                </div>{origin_row}
                 <div class="info-row">
                     <span class="info-label">Port</span>
                     <span class="info-value">{port}</span>
@@ -245,8 +341,13 @@ def build_success_email(user, ip, port, method):
     """
 
 # failed login
-def build_failed_email(reason, user, ip, port, attempt_count=None):
+def build_failed_email(reason, user, ip, port, attempt_count=None, location=None):
     attempt_info = f"Attempt #{attempt_count}" if attempt_count else "Authentication Failure"
+    origin_row = f"""
+                <div class="info-row">
+                    <span class="info-label">Origin</span>
+                    <span class="info-value">{html.escape(location)}</span>
+                </div>""" if location else ""
     
     return f"""
 <!DOCTYPE html>
@@ -457,7 +558,7 @@ def build_failed_email(reason, user, ip, port, attempt_count=None):
                 <div class="info-row">
                     <span class="info-label">Source IP</span>
                     <span class="info-value"><span class="ip-block">{ip}</span></span>
-                </div>
+                </div>{origin_row}
                 <div class="info-row">
                     <span class="info-label">Port</span>
                     <span class="info-value">{port}</span>
@@ -483,7 +584,15 @@ def build_failed_email(reason, user, ip, port, attempt_count=None):
     """
 
 
-def build_multiple_failures_email(ip, count, time_window, last_user, last_reason):
+def build_multiple_failures_email(ip, count, time_window, last_user, last_reason, history=None, location=None):
+    # what this monitor has already seen from the IP, see IPHistory
+    first_seen, users, last_success = (html.escape(value) for value in summarize(history))
+    origin_row = f"""
+                <div class="detail-row">
+                    <div class="detail-label">Origin</div>
+                    <div class="detail-value">{html.escape(location)}</div>
+                </div>""" if location else ""
+
     return f"""
 <!DOCTYPE html>
 <html lang="en">
@@ -726,7 +835,7 @@ def build_multiple_failures_email(ip, count, time_window, last_user, last_reason
                 <div class="detail-row">
                     <div class="detail-label">Source IP Address</div>
                     <div class="detail-value">{ip}</div>
-                </div>
+                </div>{origin_row}
                 <div class="detail-row">
                     <div class="detail-label">Last Username Attempted</div>
                     <div class="detail-value">{last_user}</div>
@@ -735,6 +844,18 @@ def build_multiple_failures_email(ip, count, time_window, last_user, last_reason
                     <div class="detail-label">Last Failure Reason</div>
                     <div class="detail-value">{last_reason}</div>
                 </div>
+                <div class="detail-row">
+                    <div class="detail-label">Previously Succeeded As</div>
+                    <div class="detail-value">{last_success}</div>
+                </div>
+                <div class="detail-row">
+                    <div class="detail-label">Failed Usernames</div>
+                    <div class="detail-value">{users}</div>
+                </div>
+                <div class="detail-row">
+                    <div class="detail-label">First Seen</div>
+                    <div class="detail-value">{first_seen}</div>
+                </div>
             </div>
             
             <div class="action-box">
@@ -762,51 +883,81 @@ def build_multiple_failures_email(ip, count, time_window, last_user, last_reason
     """
 
 class SSHLogHandler(FileSystemEventHandler):
-    def __init__(self):
+    def __init__(self, min_interval=0.05, max_latency=1.0):
+        # modification events only mark the log dirty, drain_loop() does the reading
+        self.dirty = threading.Event()
+        self.min_interval = min_interval
+        self.max_latency = max_latency
+
         # start reading from the end of file
-        with open(AUTH_LOG, "r") as f:
-            f.seek(0, 2) 
-            self.last_size = f.tell()
+        self.tail = LogTail(AUTH_LOG)
 
     def on_modified(self, event):
         if event.src_path == AUTH_LOG:
-            with open(AUTH_LOG, "r") as f:
-                f.seek(self.last_size)
-                new_lines = f.readlines()
-                self.last_size = f.tell()
-                for line in new_lines:
-                    self.parse_line(line.strip())
+            self.dirty.set()
+
+    def drain(self):
+        # complete lines appended since the last drain, read in one pass
+        data = self.tail.read()
+        if not data:
+            return
+
+        if classifier and classifier.wants(data):
+            # classify in worker processes, then apply in log order here
+            classified = classifier.classify(data)
+        else:
+            classified = classify_lines(data.decode("utf-8", "replace").split("\n"))
+        for kind, groups in classified:
+            self.handle(kind, groups)
+
+    def drain_loop(self, stop):
+        # the max_latency timeout doubles as the polling fallback when no
+        # filesystem events arrive (e.g. no inotify on this filesystem)
+        while not stop.is_set():
+            self.dirty.wait(self.max_latency)
+            self.dirty.clear()
+            self.drain()
+            # let further writes pile up so they are handled in one batch
+            stop.wait(self.min_interval)
 
     def parse_line(self, line):
+        match = classify_line(line)
+        if match:
+            self.handle(*match)
+
+    def handle(self, kind, groups):
+        # stateful part of parsing, always runs in log order on this thread
         current_time = time.time()
 
         # SESSION CLOSE 
-        close_match = CLOSE_REGEX.search(line)
-        if close_match:
-            _, ip, port = close_match.groups()
+        if kind == SESSION_CLOSE:
+            _, ip, port = groups
             session_key = f"{ip}:{port}"
             active_sessions.discard(session_key)
             failed_attempts.pop(ip, None)  
+            record_event(make_event(SESSION_CLOSE, ip, port, **(geo_lookup(ip) or {})))
             return
 
         # SUCCESS LOGIN 
-        success_match = SUCCESS_REGEX.search(line)
-        if success_match:
-            method, user, ip, port = success_match.groups()
+        if kind == LOGIN_SUCCESS:
+            method, user, ip, port = groups
             session_key = f"{ip}:{port}"
             active_sessions.add(session_key)
 
             # Clear failed attempts after a successful login
             failed_attempts.pop(ip, None)
+            ip_history.record_success(ip, user, current_time)
 
-            html_body = build_success_email(user, ip, port, method)
-            send_email("SSH: Successful Login Detected", html_body, is_html=True)
+            geo = geo_lookup(ip)
+            html_body = build_success_email(user, ip, port, method, describe(geo))
+            event = make_event(LOGIN_SUCCESS, ip, port, user, method=method, **(geo or {}))
+            record_event(event)
+            send_alert("SSH: Successful Login Detected", html_body, is_html=True, event=event)
             return
 
         # FAILED LOGIN
-        fail_match = FAIL_REGEX.search(line)
-        if fail_match:
-            reason, user, ip, port = fail_match.groups()
+        if kind == LOGIN_FAILED:
+            reason, user, ip, port = groups
             session_key = f"{ip}:{port}"
             active_sessions.add(session_key)
 
@@ -816,23 +967,133 @@ class SSHLogHandler(FileSystemEventHandler):
             attempts = [t for t in attempts if current_time - t <= TIME_WINDOW]
             attempts.append(current_time)
             failed_attempts[ip] = attempts
+            ip_history.record_failure(ip, user, current_time)
 
             # send individual failed login alert with styled HTML
-            html_body = build_failed_email(reason, user, ip, port, len(attempts))
-            send_email(f"SSH: Failed Login from {ip}", html_body, is_html=True)
+            geo = geo_lookup(ip)
+            html_body = build_failed_email(reason, user, ip, port, len(attempts), describe(geo))
+            event = make_event(LOGIN_FAILED, ip, port, user, reason=reason, count=len(attempts), **(geo or {}))
+            record_event(event)
+            send_alert(f"SSH: Failed Login from {ip}", html_body, is_html=True, event=event)
 
             # send threshold alert if reached exactly at threshold
             if len(attempts) == FAIL_THRESHOLD:
-                html_body = build_multiple_failures_email(ip, FAIL_THRESHOLD, TIME_WINDOW, user, reason)
-                send_email(f"🚨 CRITICAL: Multiple SSH Failures from {ip}", html_body, is_html=True)
+                history = ip_history.get(ip)
+                html_body = build_multiple_failures_email(ip, FAIL_THRESHOLD, TIME_WINDOW, user, reason,
+                                                          history, describe(geo))
+                event = make_event(MULTIPLE_FAILURES, ip, port, user, reason=reason,
+                                   count=FAIL_THRESHOLD, window=TIME_WINDOW,
+                                   first_seen=history["first_seen"],
+                                   users_tried=list(history["users"]),
+                                   last_success=history["last_success"],
+                                   **(geo or {}))
+                record_event(event)
+                send_alert(f"🚨 CRITICAL: Multiple SSH Failures from {ip}", html_body, is_html=True, event=event)
+
+            if sketches:
+                for rule, key, estimate in sketches.add_failure(ip, user, current_time):
+                    self.sketch_alert(rule, key, estimate, ip, user)
+
+            for rule, key, count in geo_rules.add_failure(geo, current_time):
+                self.geo_alert(rule, key, count, ip, user)
             return
 
+    def sketch_alert(self, rule, key, estimate, ip, user):
+        if rule["key"] == "user":
+            summary = f"User {key} targeted from ~{estimate} distinct IPs in {sketches.window}s"
+        else:
+            summary = f"IP {key} tried ~{estimate} distinct usernames in {sketches.window}s"
+
+        top_users = ", ".join(f"{name} ({count})" for name, count in sketches.top_users.top())
+        top_ips = ", ".join(f"{addr} ({count})" for addr, count in sketches.top_ips.top())
+        message = (f"{summary}\n\n"
+                   f"Rule: {rule['name']} (threshold {rule['threshold']})\n"
+                   f"Most targeted users: {top_users}\n"
+                   f"Most active IPs: {top_ips}\n"
+                   f"Counts are estimates over the last {sketches.window} seconds.\n")
+
+        event = make_event(SKETCH_RULE, ip, user=user, rule=rule["name"], key=key,
+                           distinct=estimate, window=sketches.window)
+        record_event(event)
+        send_alert(f"🚨 CRITICAL: {summary}", message, event=event)
+
+    def geo_alert(self, rule, key, count, ip, user):
+        source = f"AS{key}" if rule["field"] == "asn" else key
+        window = rule.get("window", 600)
+        summary = f"{count} failed SSH logins from {source} in {window}s"
+        message = (f"{summary}\n\n"
+                   f"Rule: {rule['name']} (threshold {rule['threshold']})\n"
+                   f"Latest source: {ip} ({describe(geo_lookup(ip))})\n"
+                   f"Latest username: {user}\n")
+
+        event = make_event(GEO_RULE, ip, user=user, rule=rule["name"], key=key, count=count,
+                           window=window, **(geo_lookup(ip) or {}))
+        record_event(event)
+        send_alert(f"🚨 CRITICAL: {summary}", message, event=event)
+
 if __name__ == "__main__":
+    # needed for worker processes in the frozen (PyInstaller) binary
+    multiprocessing.freeze_support()
+
+    # `ssh-monitor query ...` searches the event store instead of monitoring
+    if len(sys.argv) > 1 and sys.argv[1] == "query":
+        sys.exit(query_main(sys.argv[2:], STORE_PATH))
+
+    # `ssh-monitor ctl <command>` talks to a running monitor
+    if len(sys.argv) > 1 and sys.argv[1] == "ctl":
+        if not CONTROL_SOCKET:
+            sys.exit("control.socket is not set in config.yaml")
+        sys.exit(ctl_main(sys.argv[2:], CONTROL_SOCKET))
+
+    # `ssh-monitor geoip-build input.csv output.db` converts a CSV range list
+    if len(sys.argv) > 1 and sys.argv[1] == "geoip-build":
+        if len(sys.argv) != 4:
+            sys.exit("usage: ssh-monitor geoip-build input.csv output.db")
+        print(f"✅ {build_database(sys.argv[2], sys.argv[3])} ranges written to {sys.argv[3]}")
+        sys.exit(0)
+
+    if output_cfg:
+        try:
+            event_output = EventWriter(**output_cfg)
+        except ValueError as e:
+            sys.exit(f"Invalid output config: {e}")
+        if event_output.target == "stdout":
+            # keep stdout for the event stream, status messages go to stderr; done
+            # before any thread or worker process exists that could print
+            sys.stdout = sys.stderr
+
+    if classifier:
+        classifier.start()
+
+    # before the store / output threads, the socket is bound under a temporary umask
+    try:
+        control = ControlServer(CONTROL_SOCKET, runtime_stats).start() if CONTROL_SOCKET else None
+    except OSError as e:
+        sys.exit(f"Cannot create control socket: {e}")
+    if control_cfg.get("signal"):
+        # `kill -USR1 <pid>` dumps every thread's stack to stderr, even if the GIL is stuck
+        faulthandler.register(signal.SIGUSR1, all_threads=True)
+
+    try:
+        get_sinks()
+    except ValueError as e:
+        sys.exit(f"Invalid sinks config: {e}")
+
+    if STORE_ENABLED:
+        event_store = EventStore(STORE_PATH, **store_cfg).start()
+
+    if event_output:
+        event_output.start()
+
     # SSH log watcher 
-    event_handler = SSHLogHandler()
+    event_handler = SSHLogHandler(**watch_cfg)
     observer = Observer()
-    observer.schedule(event_handler, path=AUTH_LOG, recursive=False)
-    observer.start()
+    if WATCH_MODE != "poll":
+        try:
+            observer.schedule(event_handler, path=AUTH_LOG, recursive=False)
+            observer.start()
+        except OSError as e:
+            print(f"⚠️ File events unavailable ({e}), polling every {event_handler.max_latency}s")
 
     # Config watcher 
     class ConfigHandler(FileSystemEventHandler):
@@ -851,11 +1112,21 @@ if __name__ == "__main__":
     print(f"📊 Alert threshold: {FAIL_THRESHOLD} failures in {TIME_WINDOW} seconds")
 
     try:
-        while True:
-            time.sleep(1)
+        event_handler.drain_loop(threading.Event())
     except KeyboardInterrupt:
-        observer.stop()
+        if observer.is_alive():
+            observer.stop()
         config_observer.stop()
+        stop_sinks()
+        if event_store:
+            event_store.stop()
+        if event_output:
+            event_output.stop()
+        if classifier:
+            classifier.close()
+        if control:
+            control.stop()
 
-    observer.join()
+    if observer.is_alive():
+        observer.join()
     config_observer.join()
\ No newline at end of file
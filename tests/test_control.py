@@ -0,0 +1,75 @@
+import os
+import socket
+import stat
+import time
+
+import pytest
+
+from utils.control import ControlServer
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = ControlServer(str(tmp_path / "ctl.sock"), lambda: {"queued": 3}, timeout=0.2).start()
+    yield server
+    server.stop()
+
+
+def request(path, command):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(path)
+        sock.sendall(command.encode() + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                return b"".join(chunks).decode()
+            chunks.append(data)
+
+
+def test_socket_is_owner_only(server):
+    assert stat.S_IMODE(os.stat(server.path).st_mode) == 0o600
+
+
+def test_bind_restores_umask(tmp_path):
+    previous = os.umask(0o022)
+    try:
+        server = ControlServer(str(tmp_path / "ctl.sock"), dict).start()
+        server.stop()
+        assert os.umask(0o022) == 0o022
+    finally:
+        os.umask(previous)
+
+
+def test_stats_and_unknown_command(server):
+    assert '"queued": 3' in request(server.path, "stats")
+    assert request(server.path, "nonsense").startswith("commands:")
+
+
+def test_silent_client_does_not_block_the_server(server):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as idle:
+        idle.connect(server.path)
+        start = time.monotonic()
+        # served once the idle connection times out
+        assert '"queued": 3' in request(server.path, "stats")
+        assert time.monotonic() - start < 2
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    path = str(tmp_path / "ctl.sock")
+    ControlServer(path, dict).start()._sock.close()
+    server = ControlServer(path, lambda: {"queued": 3}).start()
+    try:
+        assert '"queued": 3' in request(path, "stats")
+    finally:
+        server.stop()
+
+
+def test_regular_file_at_socket_path_is_kept(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("email: {}\n")
+    with pytest.raises(FileExistsError):
+        ControlServer(str(path), dict).start()
+    assert path.read_text() == "email: {}\n"
@@ -0,0 +1,119 @@
+import pytest
+
+from utils import geoip
+
+from utils.geoip import GeoAggregator, GeoIPDatabase, build_database, describe
+
+
+@pytest.fixture
+def build(tmp_path):
+    opened = []
+
+    def build(rows):
+        csv_path, db_path = tmp_path / "ranges.csv", tmp_path / "geoip.db"
+        csv_path.write_text("\n".join(rows) + "\n")
+        count = build_database(str(csv_path), str(db_path))
+        opened.append(GeoIPDatabase(str(db_path)))
+        return count, opened[-1]
+
+    yield build
+    for db in opened:
+        db.close()
+
+
+def country(db, ip):
+    geo = db.lookup(ip)
+    return geo and geo["country"]
+
+
+def test_cidr_and_range_rows(build):
+    count, db = build([
+        "network,country,asn,as_org",
+        "8.8.8.0/24,US,15169,Google LLC",
+        "# comment",
+        "1.1.1.0,1.1.1.255,AU,13335,Cloudflare",
+        "2001:db8::/32,ZZ,1,ignored",
+    ])
+    assert count == 2
+    assert db.lookup("8.8.8.8") == {"country": "US", "asn": 15169, "as_org": "Google LLC"}
+    assert describe(db.lookup("1.1.1.1")) == "AU · AS13335 Cloudflare"
+    assert db.lookup("9.9.9.9") is None
+    assert db.lookup("not an ip") is None
+
+
+def test_nested_range_is_most_specific_and_outer_range_still_covers_the_rest(build):
+    count, db = build([
+        "10.0.0.0/8,ZZ,1,outer",
+        "10.1.0.0/16,YY,2,inner",
+        "10.1.2.0/24,XX,3,innermost",
+    ])
+    assert country(db, "10.0.0.1") == "ZZ"
+    assert country(db, "10.1.0.1") == "YY"
+    assert country(db, "10.1.2.3") == "XX"
+    assert country(db, "10.1.3.0") == "YY"
+    assert country(db, "10.2.0.1") == "ZZ"
+    assert country(db, "10.255.255.255") == "ZZ"
+    assert country(db, "11.0.0.0") is None
+    # outer, inner, innermost, inner, outer
+    assert count == 5
+
+
+def test_partial_overlap_and_duplicates(build):
+    _, db = build([
+        "192.168.0.0,192.168.0.199,AA,1,first",
+        "192.168.0.100,192.168.0.255,BB,2,second",
+        "192.168.0.100,192.168.0.255,CC,3,later duplicate",
+    ])
+    assert country(db, "192.168.0.50") == "AA"
+    # the overlap goes to the smaller range (156 vs 200 addresses), the later row on ties
+    assert country(db, "192.168.0.150") == "CC"
+    assert country(db, "192.168.0.255") == "CC"
+
+
+def test_adjacent_identical_ranges_are_merged(build):
+    count, db = build([
+        "10.0.0.0/25,US,1,same",
+        "10.0.0.128/25,US,1,same",
+    ])
+    assert count == 1
+    assert country(db, "10.0.0.200") == "US"
+
+
+@pytest.mark.parametrize("contents", [
+    b"",
+    b"SSHGEO1",
+    b"NOTGEO1\0" + bytes(4),
+    # header promises two records, only one follows
+    geoip.HEADER.pack(geoip.MAGIC, 2) + bytes(geoip.RECORD.size),
+    # trailing garbage after the records
+    geoip.HEADER.pack(geoip.MAGIC, 0) + b"x",
+])
+def test_short_or_corrupt_database_is_rejected_at_open(tmp_path, contents):
+    path = tmp_path / "geoip.db"
+    path.write_bytes(contents)
+    with pytest.raises(ValueError):
+        GeoIPDatabase(str(path))
+
+
+def test_aggregator_fires_once_per_window():
+    rules = GeoAggregator([{"name": "noisy", "field": "asn", "threshold": 3, "window": 60}])
+    geo = {"country": "US", "asn": 64500, "as_org": "Example"}
+    fired = [rules.add_failure(geo, ts) for ts in (0, 10, 20, 30, 40)]
+    assert [len(f) for f in fired] == [0, 0, 1, 0, 0]
+    # a window after the first alert, once the threshold is reached again
+    fired = [rules.add_failure(geo, ts) for ts in (100, 110, 120)]
+    assert [len(f) for f in fired] == [0, 0, 1]
+    assert fired[-1][0][1:] == (64500, 3)
+
+
+@pytest.mark.parametrize("rule, message", [
+    ({"field": "asn", "threshold": 3}, "no name"),
+    ({"name": "x", "field": "city", "threshold": 3}, "field must be"),
+    ({"name": "x", "threshold": 3}, "field must be"),
+    ({"name": "x", "field": "asn"}, "threshold"),
+    ({"name": "x", "field": "asn", "threshold": 2.5}, "threshold"),
+    ({"name": "x", "field": "asn", "threshold": 3, "window": 0}, "window"),
+])
+def test_invalid_rules_are_rejected(rule, message):
+    with pytest.raises(ValueError, match=message):
+        GeoAggregator([rule])
@@ -0,0 +1,49 @@
+from utils.history import IPHistory, summarize
+
+
+def test_least_recently_seen_ip_is_evicted():
+    history = IPHistory(max_ips=2)
+    history.record_failure("10.0.0.1", "root", 1)
+    history.record_failure("10.0.0.2", "root", 2)
+    history.record_failure("10.0.0.1", "admin", 3)
+    history.record_failure("10.0.0.3", "root", 4)
+    assert list(history.entries) == ["10.0.0.1", "10.0.0.3"]
+    assert history.get("10.0.0.2") is None
+
+
+def test_usernames_are_capped_per_ip():
+    history = IPHistory(max_users=3)
+    for user in ["root", "admin", "root", "oracle", "test", "guest"]:
+        history.record_failure("10.0.0.1", user, 1)
+    entry = history.get("10.0.0.1")
+    assert list(entry["users"]) == ["root", "admin", "oracle"]
+    assert entry["more_users"]
+
+
+def test_first_seen_and_last_success():
+    history = IPHistory()
+    history.record_failure("10.0.0.1", "root", 100)
+    history.record_success("10.0.0.1", "alice", 200)
+    history.record_success("10.0.0.1", "bob", 300)
+    history.record_failure("10.0.0.1", "admin", 400)
+    entry = history.get("10.0.0.1")
+    assert entry["first_seen"] == 100
+    assert entry["last_success"] == ("bob", 300)
+    # successful logins are not failed attempts
+    assert list(entry["users"]) == ["root", "admin"]
+
+
+def test_summarize_rows():
+    history = IPHistory(max_users=2)
+    for user in ["root", "admin", "oracle"]:
+        history.record_failure("10.0.0.1", user, 0)
+    history.record_success("10.0.0.1", "alice", 86400)
+    assert summarize(history.get("10.0.0.1")) == (
+        "1970-01-01 00:00:00 UTC",
+        "root, admin, …",
+        "alice at 1970-01-02 00:00:00 UTC",
+    )
+
+
+def test_summarize_unknown_ip():
+    assert summarize(None) == ("Unknown", "Unknown", "None seen")
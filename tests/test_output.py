@@ -0,0 +1,68 @@
+import json
+import os
+import socket
+import struct
+
+from utils.events import make_event, SESSION_CLOSE, LOGIN_FAILED
+from utils.output import BASE_FIELDS, EventWriter
+
+
+def read_all(sock):
+    data = b""
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_ndjson_events_always_carry_base_fields(tmp_path):
+    path = str(tmp_path / "events.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+
+    writer = EventWriter(target=f"unix:{path}", flush_interval=0.05).start()
+    writer.write({"type": SESSION_CLOSE, "ts": 1.0, "ip": "1.2.3.4"})
+    writer.write(make_event(LOGIN_FAILED, "1.2.3.4", 22, "root", reason="Failed password"))
+    conn, _ = server.accept()
+    writer.stop()
+
+    events = [json.loads(line) for line in read_all(conn).splitlines()]
+    conn.close()
+    server.close()
+    assert all(set(BASE_FIELDS) <= set(event) for event in events)
+    assert events[0]["user"] is None and events[0]["v"] == 1
+    assert events[1]["reason"] == "Failed password"
+
+
+def test_binary_format_over_fifo(tmp_path):
+    path = str(tmp_path / "events.fifo")
+    os.mkfifo(path)
+    writer = EventWriter(target=f"fifo:{path}", format="binary", flush_interval=0.05)
+    reader = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    writer.write(make_event(SESSION_CLOSE, "1.2.3.4", 22))
+    writer.flush()
+
+    data = os.read(reader, 4096)
+    os.close(reader)
+    length = struct.unpack("!I", data[:4])[0]
+    assert json.loads(data[4:4 + length])["type"] == SESSION_CLOSE
+
+
+def test_missing_consumer_buffers_then_drops_whole_records(tmp_path):
+    writer = EventWriter(target=f"unix:{tmp_path / 'nobody.sock'}", max_buffer=300)
+    for _ in range(5):
+        writer.write(make_event(LOGIN_FAILED, "1.2.3.4", 22, "root"))
+    writer.flush()
+    assert writer.dropped > 0
+    assert writer.buffered == sum(len(record) for record in writer.records) <= 300
+
+
+def test_stdout_target_leaves_fd_1_blocking():
+    writer = EventWriter(target="stdout")
+    writer._open()
+    try:
+        assert os.get_blocking(1)
+    finally:
+        writer._close()
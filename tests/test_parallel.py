@@ -0,0 +1,25 @@
+from utils.parallel import ParallelClassifier, split_chunks
+from utils.parse import classify_lines
+
+LOG = (
+    "sshd[1]: Accepted password for alice from 10.0.0.1 port 5000 ssh2\n"
+    "sshd[2]: Failed password for root from 10.0.0.2 port 5001 ssh2\n"
+    "CRON[3]: session opened for user root\n"
+    "sshd[4]: Connection closed by 10.0.0.3 port 5002\n"
+) * 500
+
+
+def test_split_chunks_are_line_aligned():
+    data = LOG.encode()
+    chunks = split_chunks(data, 1000)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(data)
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        assert end == start and data[end - 1:end] == b"\n"
+
+
+def test_parallel_matches_sequential():
+    classifier = ParallelClassifier(workers=2, chunk_bytes=4096, min_bytes=1024).start()
+    try:
+        assert classifier.classify(LOG.encode()) == classify_lines(LOG.split("\n"))
+    finally:
+        classifier.close()
@@ -0,0 +1,51 @@
+from utils.events import make_event, LOGIN_SUCCESS, LOGIN_FAILED, MULTIPLE_FAILURES, SKETCH_RULE
+from utils.ratelimit import AlertLimiter, DedupCache, TokenBucket
+from utils.sinks import AlertSink
+
+
+def test_token_bucket_allows_burst_then_refuses():
+    bucket = TokenBucket(rate=0, capacity=3)
+    assert [bucket.consume() for _ in range(4)] == [True, True, True, False]
+
+
+def test_dedup_cache_suppresses_within_ttl():
+    cache = DedupCache(ttl=60)
+    assert not cache.seen(("login_failed", "1.2.3.4", "root"))
+    assert cache.seen(("login_failed", "1.2.3.4", "root"))
+    assert not cache.seen(("login_failed", "1.2.3.4", "admin"))
+
+
+def test_critical_alert_survives_exhausted_per_ip_bucket():
+    limiter = AlertLimiter(exempt=(LOGIN_SUCCESS,))
+    # rotating usernames: every failure has its own dedup key and uses a per-IP token
+    failures = [limiter.allow(make_event(LOGIN_FAILED, "1.2.3.4", 22, f"user{i}")) for i in range(6)]
+    assert failures == [True] * 5 + [False]
+
+    assert limiter.allow(make_event(MULTIPLE_FAILURES, "1.2.3.4", 22, "user5"))
+    assert limiter.allow(make_event(SKETCH_RULE, "1.2.3.4", user="user5"))
+    assert limiter.take_suppressed() == {LOGIN_FAILED: 1}
+
+
+def test_critical_alert_is_still_deduplicated():
+    limiter = AlertLimiter()
+    event = make_event(MULTIPLE_FAILURES, "1.2.3.4", 22, "root")
+    assert limiter.allow(event)
+    assert not limiter.allow(event)
+
+
+def test_success_is_never_suppressed():
+    limiter = AlertLimiter(global_rate=0, global_burst=0, exempt=(LOGIN_SUCCESS,))
+    event = make_event(LOGIN_SUCCESS, "1.2.3.4", 22, "root")
+    assert all(limiter.allow(event) for _ in range(10))
+
+
+def test_sink_rate_limit_skips_critical_and_carries_suppressed_count():
+    sink = AlertSink(rate=0.0001, burst=1)
+    for event in (make_event(LOGIN_FAILED, "1.2.3.4", 22, "a"),
+                  make_event(LOGIN_FAILED, "1.2.3.4", 22, "b"),
+                  make_event(MULTIPLE_FAILURES, "1.2.3.4", 22, "b")):
+        sink.submit({"subject": event["type"], "event": event})
+
+    delivered = [sink.queue.get_nowait() for _ in range(sink.queue.qsize())]
+    assert [alert["subject"] for alert in delivered] == [LOGIN_FAILED, MULTIPLE_FAILURES]
+    assert delivered[1]["suppressed"] == 1
@@ -0,0 +1,143 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from utils.events import make_event, LOGIN_FAILED
+from utils import sinks
+from utils.sinks import EmailSink, WebhookSink, SyslogSink
+
+
+def make_alert(subject="SSH: Failed Login from 1.2.3.4"):
+    event = make_event(LOGIN_FAILED, "1.2.3.4", 22, "root", reason="Failed password")
+    return {"ts": event["ts"], "subject": subject, "message": "", "is_html": False, "event": event}
+
+
+@pytest.fixture
+def http_server():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", received
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def syslog_server():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(5)
+    yield sock
+    sock.close()
+
+
+def test_webhook_sink_posts_batch(http_server):
+    url, received = http_server
+    sink = WebhookSink(url, batch_size=10, flush_interval=0.2).start()
+    for i in range(3):
+        sink.submit(make_alert(f"alert {i}"))
+    sink.stop()
+
+    alerts = [alert for payload in received for alert in payload["alerts"]]
+    assert [alert["subject"] for alert in alerts] == ["alert 0", "alert 1", "alert 2"]
+    assert alerts[0]["event"]["ip"] == "1.2.3.4"
+    assert "alert 0" in received[0]["text"]
+    assert sink.sent == 3 and sink.dropped == 0
+
+
+def test_webhook_sink_shows_suppressed_count(http_server):
+    url, received = http_server
+    sink = WebhookSink(url, flush_interval=0.1).start()
+    sink.submit(dict(make_alert("alert"), suppressed=4))
+    sink.stop()
+
+    assert received[0]["text"] == "alert (+4 suppressed)"
+    assert received[0]["alerts"][0]["suppressed"] == 4
+
+
+def test_syslog_sink_sends_rfc3164_datagram(syslog_server):
+    sink = SyslogSink(address=list(syslog_server.getsockname()), facility="auth", flush_interval=0.1).start()
+    sink.submit(make_alert())
+    sink.stop()
+
+    message = syslog_server.recv(4096).decode()
+    # auth (4) * 8 + warning (4)
+    assert message.startswith("<36>ssh-monitor: SSH: Failed Login from 1.2.3.4 ")
+    assert json.loads(message[message.index("{"):])["user"] == "root"
+
+
+class FlakySMTP:
+    # records delivered subjects, refuses the message at `fail_at` once
+    delivered = []
+    fail_at = None
+
+    def __init__(self, host, port, timeout=None):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def send_message(self, message):
+        if message["Subject"] == FlakySMTP.fail_at:
+            FlakySMTP.fail_at = None
+            raise sinks.smtplib.SMTPServerDisconnected("connection lost")
+        FlakySMTP.delivered.append(message["Subject"])
+
+    def quit(self):
+        pass
+
+
+def test_email_sink_retries_only_undelivered_alerts(monkeypatch):
+    monkeypatch.setattr(sinks.smtplib, "SMTP", FlakySMTP)
+    monkeypatch.setattr(FlakySMTP, "delivered", [])
+    monkeypatch.setattr(FlakySMTP, "fail_at", "a2")
+
+    def build_message(subject, message, is_html):
+        return {"Subject": subject}
+
+    email_cfg = {"smtp_server": "localhost", "smtp_port": 25, "sender_email": "a@b", "app_password": "x"}
+    sink = EmailSink(email_cfg, build_message, batch_size=10, flush_interval=0.2, backoff=0.01)
+    for i in range(4):
+        sink.queue.put(make_alert(f"a{i}"))
+    sink.start().stop()
+
+    assert FlakySMTP.delivered == ["a0", "a1", "a2", "a3"]
+    assert sink.sent == 4 and sink.dropped == 0
+
+
+def test_circuit_breaker_opens_after_failure_threshold():
+    # nothing listens on port 1, every attempt fails with connection refused
+    sink = WebhookSink("http://127.0.0.1:1", max_retries=5, backoff=0.01,
+                       failure_threshold=2, reset_timeout=60, flush_interval=0.1).start()
+    sink.submit(make_alert())
+    sink.stop()
+
+    assert sink.breaker.failures == 2
+    assert sink.breaker.state == "open"
+    assert not sink.breaker.allow()
+    assert sink.sent == 0 and sink.dropped == 1
+
+
+def test_slow_sink_does_not_block_submit():
+    sink = WebhookSink("http://127.0.0.1:1", queue_size=2)
+    for _ in range(5):
+        sink.submit(make_alert())
+    assert sink.queue.qsize() == 2
+    assert sink.dropped == 3
@@ -0,0 +1,112 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from utils.sketches import CountMinSketch, HyperLogLog, SketchAnalytics, WindowedDistinct, WindowedHeavyHitters
+
+SEEDS = range(8)
+
+
+@pytest.mark.parametrize("n", [100, 1000, 3000, 10000, 30000])
+def test_hyperloglog_error_against_exact_count(n):
+    sigma = 1.04 / math.sqrt(1 << 10)
+    errors = []
+    for seed in SEEDS:
+        hll = HyperLogLog(precision=10)
+        items = {f"{seed}-{i}" for i in range(n)}
+        for item in items:
+            hll.add(item)
+            hll.add(item)  # duplicates must not move the estimate
+        errors.append(hll.count() / len(items) - 1)
+
+    # every run within 4 standard errors, and no systematic bias across runs
+    assert max(map(abs, errors)) < 4 * sigma
+    assert abs(sum(errors) / len(errors)) < 4 * sigma / math.sqrt(len(errors))
+
+
+def test_hyperloglog_merge_is_union():
+    a, b, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(5000):
+        (a if i % 2 else b).add(str(i))
+        both.add(str(i))
+    a.merge(b)
+    assert a.count() == both.count()
+
+
+def test_count_min_never_undercounts():
+    rng = random.Random(1)
+    cms = CountMinSketch(width=64, depth=4)
+    exact = Counter(f"user{int(rng.paretovariate(1.2))}" for _ in range(20000))
+    for item, count in exact.items():
+        cms.add(item, count)
+
+    total = sum(exact.values())
+    for item, count in exact.items():
+        assert count <= cms.estimate(item) <= count + total
+
+
+def test_windowed_heavy_hitters_never_undercount():
+    rng = random.Random(2)
+    hitters = WindowedHeavyHitters(window=600, slots=5, width=32, depth=3, top_k=3)
+    exact = Counter()
+    for ts in range(0, 500):
+        ip = f"10.0.0.{int(rng.expovariate(0.2))}"
+        exact[ip] += 1
+        assert hitters.add(ip, ts) >= exact[ip]
+    assert hitters.top()[0][0] == exact.most_common(1)[0][0]
+
+
+def test_windowed_distinct_expires_old_slots():
+    distinct = WindowedDistinct(window=600, slots=5)
+    for i in range(100):
+        distinct.add("root", f"10.0.0.{i}", ts=10)
+    assert round(distinct.add("root", "10.0.0.0", ts=300)) == 100
+    # the slot holding the first 100 has left the window, the re-add at 300 has not
+    assert round(distinct.add("root", "10.0.1.1", ts=720)) == 2
+
+
+def test_windowed_distinct_evicts_least_recent_key():
+    distinct = WindowedDistinct(max_keys=2)
+    distinct.add("a", "x", 0)
+    distinct.add("b", "x", 0)
+    distinct.add("a", "y", 0)
+    distinct.add("c", "x", 0)
+    assert list(distinct.keys) == ["a", "c"]
+
+
+def test_rule_fires_once_per_window():
+    sketches = SketchAnalytics(window=600, rules=[{"name": "spray", "key": "ip", "threshold": 5}])
+    fired = []
+    for i in range(20):
+        fired += sketches.add_failure("10.0.0.1", f"user{i}", ts=100 + i)
+    assert [(rule["name"], key, estimate) for rule, key, estimate in fired] == [("spray", "10.0.0.1", 5)]
+
+    # a full window later the rule can fire again
+    fired = []
+    for i in range(20):
+        fired += sketches.add_failure("10.0.0.1", f"other{i}", ts=800 + i)
+    assert len(fired) == 1
+
+
+def test_rule_match_limits_keys():
+    sketches = SketchAnalytics(rules=[{"name": "root", "key": "user", "match": "root", "threshold": 2}])
+    fired = []
+    for i in range(5):
+        fired += sketches.add_failure(f"10.0.0.{i}", "admin", ts=i)
+        fired += sketches.add_failure(f"10.0.0.{i}", "root", ts=i)
+    assert [key for _, key, _ in fired] == ["root"]
+
+
+@pytest.mark.parametrize("rule, message", [
+    ({"key": "ip", "threshold": 5}, "no name"),
+    ({"name": "x", "key": "host", "threshold": 5}, "key must be"),
+    ({"name": "x", "threshold": 5}, "key must be"),
+    ({"name": "x", "key": "ip"}, "threshold"),
+    ({"name": "x", "key": "ip", "threshold": "50"}, "threshold"),
+    ({"name": "x", "key": "ip", "threshold": 0}, "threshold"),
+])
+def test_invalid_rules_are_rejected(rule, message):
+    with pytest.raises(ValueError, match=message):
+        SketchAnalytics(rules=[rule])
@@ -0,0 +1,46 @@
+import os
+import time
+
+from utils.events import make_event, LOGIN_SUCCESS, LOGIN_FAILED
+from utils.store import EventStore, parse_time, query_main
+
+
+def test_events_are_written_and_queried_by_ip_user_and_type(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"), flush_interval=0.05).start()
+    store.append(make_event(LOGIN_FAILED, "1.2.3.4", 22, "root", reason="Failed password"))
+    store.append(make_event(LOGIN_SUCCESS, "1.2.3.4", 23, "alice", method="publickey"))
+    store.append(make_event(LOGIN_FAILED, "5.6.7.8", 22, "root", reason="Invalid user"))
+    store.stop()
+
+    assert store.written == 3
+    assert [e["user"] for e in store.query(ip="1.2.3.4", event_type=LOGIN_SUCCESS)] == ["alice"]
+    assert {e["ip"] for e in store.query(user="root")} == {"1.2.3.4", "5.6.7.8"}
+    assert store.query(ip="1.2.3.4", since=time.time() + 60) == []
+
+
+def test_retention_runs_when_writer_starts(tmp_path):
+    path = str(tmp_path / "events.db")
+    store = EventStore(path, flush_interval=0.05).start()
+    old = make_event(LOGIN_FAILED, "1.2.3.4", 22, "root")
+    old["ts"] -= 40 * 86400
+    store.append(old)
+    store.append(make_event(LOGIN_FAILED, "1.2.3.4", 22, "root"))
+    store.stop()
+    assert len(store.query()) == 2
+
+    restarted = EventStore(path, flush_interval=0.05, retention_days=30).start()
+    restarted.stop()
+    assert len(restarted.query()) == 1
+
+
+def test_query_does_not_create_missing_database(tmp_path, capsys):
+    path = str(tmp_path / "missing.db")
+    assert query_main(["--ip", "1.2.3.4"], path) == 1
+    assert not os.path.exists(path)
+    assert "Cannot read event store" in capsys.readouterr().out
+
+
+def test_parse_time_relative_and_absolute():
+    assert abs(parse_time("2h") - (time.time() - 7200)) < 5
+    assert parse_time("2024-05-01") == parse_time("2024-05-01 00:00")
+    assert parse_time(None) is None
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from utils.parse import classify_lines
+from utils.tail import LogTail
+
+FAILED = "sshd[1]: Failed password for root from 10.0.0.{} port 22 ssh2\n"
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / "auth.log"
+    path.write_text("sshd[1]: old line before the monitor started\n")
+    return path
+
+
+def append(path, text):
+    with open(path, "a") as f:
+        f.write(text)
+
+
+def test_starts_at_end_of_file(log):
+    tail = LogTail(str(log))
+    assert tail.read() == b""
+    append(log, FAILED.format(1))
+    assert tail.read() == FAILED.format(1).encode()
+
+
+def test_partial_last_line_is_held_back(log):
+    tail = LogTail(str(log))
+    line = FAILED.format(1)
+    append(log, line[:20])
+    assert tail.read() == b""
+    append(log, line[20:] + line[:10])
+    assert tail.read() == line.encode()
+    assert tail.partial == line[:10].encode()
+
+
+def test_several_writes_are_read_in_one_drain(log):
+    tail = LogTail(str(log))
+    for i in range(50):
+        append(log, FAILED.format(i))
+    classified = classify_lines(tail.read().decode().split("\n"))
+    assert [groups[2] for _, groups in classified] == [f"10.0.0.{i}" for i in range(50)]
+    assert tail.read() == b""
+
+
+def test_rotation_reopens_new_file_from_the_top(log):
+    tail = LogTail(str(log))
+    append(log, FAILED.format(1) + "half a li")
+    assert tail.read() == FAILED.format(1).encode()
+
+    os.rename(log, str(log) + ".1")
+    append(str(log) + ".1", "ne\n")
+    log.write_text(FAILED.format(2))
+    # lines still written to the old file are drained first
+    assert tail.read() == b"half a line\n"
+    # then the new one from its first byte
+    assert tail.read() == FAILED.format(2).encode()
+    assert tail.partial == b""
+
+
+def test_truncation_starts_over(log):
+    tail = LogTail(str(log))
+    append(log, FAILED.format(1) * 3)
+    tail.read()
+    log.write_text(FAILED.format(2))
+    assert tail.read() == FAILED.format(2).encode()
+
+
+def test_missing_file_during_rotation_is_not_an_error(log):
+    tail = LogTail(str(log))
+    os.unlink(log)
+    assert tail.read() == b""
+    log.write_text(FAILED.format(3))
+    assert tail.read() == FAILED.format(3).encode()
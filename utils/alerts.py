@@ -1,30 +1,102 @@
 import yaml
-import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from config.setup_config import load_config
+from utils.sinks import EmailSink, SINK_TYPES
+from utils.ratelimit import AlertLimiter
+from utils.events import LOGIN_SUCCESS
 # load config
 config = load_config()
-    
+
 email_cfg = config["email"]
 
-def send_email(subject: str, message: str, is_html: bool = False):
+# alert sinks, started on first use
+_sinks = None
+
+# global / per-IP rate limits and dedup, successful logins are never suppressed
+limiter = AlertLimiter(exempt=(LOGIN_SUCCESS,), **config.get("rate_limit", {}))
+
+
+def build_message(subject: str, message: str, is_html: bool = False):
+    msg = MIMEMultipart()
+    msg['From'] = email_cfg["sender_email"]
+    msg['To'] = email_cfg["recipient_email"]
+    msg['Subject'] = subject
+
+    content_type = "html" if is_html else "plain"
+    msg.attach(MIMEText(message, content_type))
+    return msg
+
+
+def build_sinks():
+    # email is always on, extra sinks come from the `sinks` list in config.yaml;
+    # every sink is built before any is started, bad options raise ValueError
     try:
-        msg = MIMEMultipart()
-        msg['From'] = email_cfg["sender_email"]
-        msg['To'] = email_cfg["recipient_email"]
-        msg['Subject'] = subject
+        sinks = [EmailSink(email_cfg, build_message, **email_cfg.get("delivery", {}))]
+    except TypeError as e:
+        raise ValueError(f"email delivery: {e}")
+
+    for sink_cfg in config.get("sinks", []):
+        options = dict(sink_cfg)
+        sink_type = options.pop("type", None)
+        if sink_type not in SINK_TYPES:
+            raise ValueError(f"unknown sink type: {sink_type!r}")
+        try:
+            sinks.append(SINK_TYPES[sink_type](**options))
+        except TypeError as e:
+            raise ValueError(f"{sink_type} sink: {e}")
+
+    return [sink.start() for sink in sinks]
+
+
+def get_sinks():
+    # monitor.py calls this at startup, so config mistakes stop it there
+    # instead of on the parser thread at the first alert
+    global _sinks
+    if _sinks is None:
+        _sinks = build_sinks()
+    return _sinks
+
+
+def send_alert(subject: str, message: str, is_html: bool = False, event: dict = None):
+    if not limiter.allow(event):
+        return
+
+    # hand the alert to every sink's queue, delivery happens on the sink workers
+    alert = {
+        "ts": time.time(),
+        "subject": subject,
+        "message": message,
+        "is_html": is_html,
+        "event": event,
+        "suppressed": sum(limiter.take_suppressed().values()),
+    }
+    for sink in get_sinks():
+        sink.submit(alert)
 
-        content_type = "html" if is_html else "plain"
-        msg.attach(MIMEText(message, content_type))
 
-        server = smtplib.SMTP(email_cfg["smtp_server"], email_cfg["smtp_port"])
-        server.starttls()
-        server.login(email_cfg["sender_email"], email_cfg["app_password"])
-        server.send_message(msg)
-        server.quit()
+def alert_stats():
+    return {
+        "sinks": [
+            {
+                "name": sink.name,
+                "queued": sink.queue.qsize(),
+                "sent": sink.sent,
+                "dropped": sink.dropped,
+                "suppressed": sink.suppressed,
+                "circuit": sink.breaker.state,
+            }
+            for sink in _sinks or []
+        ],
+        "rate_limiter": {
+            "ip_buckets": len(limiter.per_ip.buckets),
+            "dedup_keys": len(limiter.dedup.expiry),
+            "pending_suppressed": sum(limiter.suppressed.values()),
+        },
+    }
 
-        print(f"✅ Email sent: {subject}")
 
-    except Exception as e:
-        print(f"⚠️ Failed to send email: {e}")
\ No newline at end of file
+def stop_sinks(timeout: float = 5):
+    for sink in _sinks or []:
+        sink.stop(timeout)
@@ -0,0 +1,192 @@
+import json
+import os
+import socket
+import stat
+import sys
+import threading
+import traceback
+import tracemalloc
+from collections import Counter
+
+HELP = """commands:
+  stats                        sizes of in-memory state and queues
+  stacks                       stack dump of every thread
+  profile start [interval]     start the sampling CPU profiler (default 0.005s)
+  profile stop [top]           stop it and show the hottest stacks (default 20)
+  tracemalloc start [frames]   start tracing allocations (default 10 frames)
+  tracemalloc snapshot [top]   top allocators since start (default 20)
+  tracemalloc stop             stop tracing
+"""
+
+
+def thread_stacks():
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    lines = []
+    for ident, frame in sys._current_frames().items():
+        lines.append(f"--- {names.get(ident, 'unknown')} ({ident}) ---")
+        lines.extend(line.rstrip() for line in traceback.format_stack(frame))
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    # samples every other thread's stack at a fixed interval, only runs between start() and stop()
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self.total = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                # collapsed format: thread;outermost;...;innermost
+                self.samples[";".join([names.get(ident, "unknown")] + stack[::-1])] += 1
+            self.total += 1
+
+    def stop(self, top=20):
+        self._stop.set()
+        self._thread.join()
+        lines = [f"{self.total} samples every {self.interval}s"]
+        for stack, count in self.samples.most_common(top):
+            lines.append(f"{count:>6}  {stack}")
+        return "\n".join(lines) + "\n"
+
+
+class ControlServer:
+    # local Unix socket taking one command per connection; nothing here is
+    # created unless a control socket is configured
+    def __init__(self, path, stats, timeout=5):
+        self.path = path
+        self.stats = stats
+        self.timeout = timeout
+        self.profiler = None
+        self._sock = None
+        self._thread = threading.Thread(target=self._run, name="control", daemon=True)
+
+    def start(self):
+        # only a stale socket from an earlier run is removed, a mistyped path
+        # must never delete a regular file
+        try:
+            if not stat.S_ISSOCK(os.lstat(self.path).st_mode):
+                raise FileExistsError(f"{self.path} exists and is not a socket")
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # created owner-only, there is no window where other users can connect
+        old_umask = os.umask(0o177)
+        try:
+            self._sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        self._sock.listen(4)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._sock:
+            self._sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _run(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            with conn:
+                # one client at a time, so a silent or stuck one must not hold the socket
+                conn.settimeout(self.timeout)
+                try:
+                    command = conn.makefile().readline(4096).split()
+                except OSError:
+                    continue
+                try:
+                    reply = self.handle(command)
+                except Exception as e:
+                    reply = f"error: {e}\n"
+                try:
+                    conn.sendall(reply.encode())
+                except OSError:
+                    pass
+
+    def handle(self, command):
+        name, args = (command[0], command[1:]) if command else ("help", [])
+
+        if name == "stats":
+            return json.dumps(self.stats(), indent=2, default=str) + "\n"
+
+        if name == "stacks":
+            return thread_stacks()
+
+        if name == "profile" and args[:1] == ["start"]:
+            if self.profiler:
+                return "profiler already running\n"
+            self.profiler = SamplingProfiler(float(args[1]) if len(args) > 1 else 0.005).start()
+            return "profiler started\n"
+
+        if name == "profile" and args[:1] == ["stop"]:
+            if not self.profiler:
+                return "profiler not running\n"
+            report = self.profiler.stop(int(args[1]) if len(args) > 1 else 20)
+            self.profiler = None
+            return report
+
+        if name == "tracemalloc" and args[:1] == ["start"]:
+            tracemalloc.start(int(args[1]) if len(args) > 1 else 10)
+            return "tracemalloc started\n"
+
+        if name == "tracemalloc" and args[:1] == ["snapshot"]:
+            if not tracemalloc.is_tracing():
+                return "tracemalloc not running\n"
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            lines = [f"traced: {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB"]
+            for allocation in snapshot.statistics("traceback")[:int(args[1]) if len(args) > 1 else 20]:
+                lines.append(f"{allocation.size / 1024:>10.1f} KiB  {allocation.count:>8} blocks")
+                lines.extend(f"    {line}" for line in allocation.traceback.format())
+            return "\n".join(lines) + "\n"
+
+        if name == "tracemalloc" and args[:1] == ["stop"]:
+            tracemalloc.stop()
+            return "tracemalloc stopped\n"
+
+        return HELP
+
+
+def ctl_main(argv, path):
+    # `ssh-monitor ctl <command>` client
+    if not argv:
+        print(HELP, end="")
+        return 0
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError as e:
+            print(f"⚠️ Cannot reach control socket {path}: {e}")
+            return 1
+        sock.sendall((" ".join(argv) + "\n").encode())
+        sock.shutdown(socket.SHUT_WR)
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            sys.stdout.write(data.decode("utf-8", "replace"))
+    return 0
@@ -0,0 +1,32 @@
+import time
+
+# event types produced by the log parser
+SESSION_CLOSE = "session_close"
+LOGIN_SUCCESS = "login_success"
+LOGIN_FAILED = "login_failed"
+MULTIPLE_FAILURES = "multiple_failures"
+SKETCH_RULE = "sketch_rule"
+GEO_RULE = "geo_rule"
+
+# severity per event type, used by sinks that have a notion of priority
+SEVERITY = {
+    SESSION_CLOSE: "info",
+    LOGIN_SUCCESS: "notice",
+    LOGIN_FAILED: "warning",
+    MULTIPLE_FAILURES: "critical",
+    SKETCH_RULE: "critical",
+    GEO_RULE: "critical",
+}
+
+
+def make_event(event_type, ip, port=None, user=None, **extra):
+    event = {
+        "type": event_type,
+        "ts": time.time(),
+        "severity": SEVERITY.get(event_type, "info"),
+        "ip": ip,
+        "port": int(port) if port is not None else None,
+        "user": user,
+    }
+    event.update(extra)
+    return event
@@ -0,0 +1,188 @@
+import csv
+import heapq
+import ipaddress
+import math
+import mmap
+import socket
+import struct
+from collections import deque
+from functools import lru_cache
+from utils.rules import check_rule
+
+# database layout: MAGIC, record count, then fixed-size records sorted by start address
+MAGIC = b"SSHGEO1\0"
+HEADER = struct.Struct("!8sI")
+# start ip, end ip, country code, ASN, AS organisation (utf-8, NUL padded)
+RECORD = struct.Struct("!II2sI32s")
+START = struct.Struct("!I")
+
+
+def build_database(csv_path, db_path):
+    # rows are either "network,country,asn,as_org" (CIDR) or
+    # "start_ip,end_ip,country,asn,as_org"; lines starting with # are skipped
+    records = []
+    with open(csv_path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#") or row[0] in ("network", "start_ip"):
+                continue
+            if "/" in row[0]:
+                network = ipaddress.ip_network(row[0], strict=False)
+                if network.version != 4:
+                    continue
+                start, end = int(network.network_address), int(network.broadcast_address)
+                country, asn, org = (row[1:] + ["", "", ""])[:3]
+            else:
+                first, last = ipaddress.ip_address(row[0]), ipaddress.ip_address(row[1])
+                if first.version != 4:
+                    continue
+                start, end = int(first), int(last)
+                country, asn, org = (row[2:] + ["", "", ""])[:3]
+            records.append((start, end, country.strip().upper()[:2], int(asn or 0), org.strip()))
+
+    records = flatten(records)
+    with open(db_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records)))
+        for start, end, country, asn, org in records:
+            f.write(RECORD.pack(start, end, country.encode("ascii", "replace"), asn, org.encode()[:32]))
+    return len(records)
+
+
+def flatten(records):
+    # the lookup expects disjoint ranges, so nested / overlapping input is split
+    # at every boundary and each piece takes the most specific (smallest) range
+    # covering it; among equal sizes the later row wins
+    points = sorted({start for start, *_ in records} | {end + 1 for _, end, *_ in records})
+    order = sorted(range(len(records)), key=lambda i: records[i][0])
+    active, flat, next_record = [], [], 0
+    for point, next_point in zip(points, points[1:]):
+        while next_record < len(order) and records[order[next_record]][0] <= point:
+            i = order[next_record]
+            heapq.heappush(active, (records[i][1] - records[i][0], -i))
+            next_record += 1
+        # ranges that ended before this piece are dropped once they reach the top
+        while active and records[-active[0][1]][1] < point:
+            heapq.heappop(active)
+        if not active:
+            continue
+
+        data = records[-active[0][1]][2:]
+        if flat and flat[-1][1] == point - 1 and flat[-1][2:] == data:
+            flat[-1] = (flat[-1][0], next_point - 1) + data
+        else:
+            flat.append((point, next_point - 1) + data)
+    return flat
+
+
+class GeoIPDatabase:
+    # memory-mapped range table, binary searched on the start address,
+    # with an LRU cache in front since attackers repeat the same IPs
+    def __init__(self, path, cache_size=4096):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.count = self._check()
+        except ValueError:
+            self.map.close()
+            raise
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _check(self):
+        # a short or corrupt file must fail here with ValueError, never as a
+        # struct.error from lookup() on the parser thread
+        if len(self.map) < HEADER.size:
+            raise ValueError(f"{self.path} is not an ssh-monitor GeoIP database (too short)")
+        magic, count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an ssh-monitor GeoIP database")
+        if len(self.map) != HEADER.size + count * RECORD.size:
+            raise ValueError(f"{self.path} is truncated or corrupt: {len(self.map)} bytes "
+                             f"for {count} records, expected {HEADER.size + count * RECORD.size}")
+        return count
+
+    def _record(self, index):
+        return RECORD.unpack_from(self.map, HEADER.size + index * RECORD.size)
+
+    def _lookup(self, ip):
+        try:
+            address = START.unpack(socket.inet_aton(ip))[0]
+        except OSError:
+            return None
+
+        # last record whose start is <= address
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if START.unpack_from(self.map, HEADER.size + middle * RECORD.size)[0] <= address:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+
+        start, end, country, asn, org = self._record(low - 1)
+        if address > end:
+            return None
+        return {
+            "country": country.decode("ascii").strip("\0") or None,
+            "asn": asn or None,
+            "as_org": org.rstrip(b"\0").decode("utf-8", "replace") or None,
+        }
+
+    def close(self):
+        self.map.close()
+
+
+def describe(geo):
+    # short label for alerts, e.g. "US · AS15169 Google LLC"
+    if not geo:
+        return None
+    parts = []
+    if geo["country"]:
+        parts.append(geo["country"])
+    if geo["asn"]:
+        parts.append(f"AS{geo['asn']} {geo['as_org'] or ''}".strip())
+    return " · ".join(parts) or None
+
+
+def check_geo_rule(rule):
+    # thresholds are whole attempts, they size the per-key deque
+    rule = check_rule(rule, "geoip", integer=True)
+    name = rule["name"]
+    if rule.get("field") not in ("country", "asn"):
+        raise ValueError(f"geoip rule {name}: field must be 'country' or 'asn', got {rule.get('field')!r}")
+    window = rule.get("window", 600)
+    if isinstance(window, bool) or not isinstance(window, (int, float)) or window <= 0:
+        raise ValueError(f"geoip rule {name}: window must be a positive number, got {window!r}")
+    return rule
+
+
+class GeoAggregator:
+    # fires when `threshold` failed logins from one country / ASN fall within
+    # `window` seconds, at most once per key per window
+    def __init__(self, rules=()):
+        self.rules = [check_geo_rule(rule) for rule in rules]
+        self.attempts = {}
+        self.fired = {}
+
+    def add_failure(self, geo, ts):
+        triggered = []
+        if not geo:
+            return triggered
+
+        for rule in self.rules:
+            key = geo.get(rule["field"])
+            if key is None or rule.get("match") not in (None, key):
+                continue
+            window = rule.get("window", 600)
+            # only the latest `threshold` attempts matter, so memory stays bounded
+            attempts = self.attempts.setdefault((rule["name"], key), deque(maxlen=rule["threshold"]))
+            attempts.append(ts)
+            while attempts and ts - attempts[0] > window:
+                attempts.popleft()
+
+            fired_key = (rule["name"], key)
+            if len(attempts) >= rule["threshold"] and ts - self.fired.get(fired_key, -math.inf) >= window:
+                self.fired[fired_key] = ts
+                triggered.append((rule, key, len(attempts)))
+        return triggered
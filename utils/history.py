@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+
+
+class IPHistory:
+    # recent per-IP activity, bounded to `max_ips` entries (least recently seen evicted)
+    # and `max_users` distinct usernames per IP; `users` only holds usernames from
+    # failed attempts, a successful login is kept in `last_success`
+    def __init__(self, max_ips=10000, max_users=20):
+        self.max_ips = max_ips
+        self.max_users = max_users
+        self.entries = OrderedDict()
+
+    def _entry(self, ip, ts):
+        entry = self.entries.get(ip)
+        if entry is None:
+            entry = self.entries[ip] = {
+                "first_seen": ts,
+                "last_success": None,
+                "users": {},
+                "more_users": False,
+            }
+            if len(self.entries) > self.max_ips:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(ip)
+        return entry
+
+    def _add_user(self, entry, user):
+        if user in entry["users"]:
+            return
+        if len(entry["users"]) < self.max_users:
+            entry["users"][user] = True
+        else:
+            entry["more_users"] = True
+
+    def record_success(self, ip, user, ts):
+        entry = self._entry(ip, ts)
+        entry["last_success"] = (user, ts)
+
+    def record_failure(self, ip, user, ts):
+        self._add_user(self._entry(ip, ts), user)
+
+    def get(self, ip):
+        return self.entries.get(ip)
+
+
+def format_time(ts):
+    return time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(ts))
+
+
+def summarize(entry):
+    # plain-text (first seen, usernames tried, last success) for alerts
+    entry = entry or {}
+    first_seen = format_time(entry["first_seen"]) if entry.get("first_seen") is not None else "Unknown"
+    users = ", ".join(entry.get("users", {})) or "Unknown"
+    if entry.get("more_users"):
+        users += ", …"
+    if entry.get("last_success"):
+        user, ts = entry["last_success"]
+        last_success = f"{user} at {format_time(ts)}"
+    else:
+        last_success = "None seen"
+    return first_seen, users, last_success
@@ -0,0 +1,163 @@
+import errno
+import json
+import os
+import socket
+import struct
+import threading
+from collections import deque
+
+SCHEMA_VERSION = 1
+
+# fields present on every event (null when not known), extra fields depend on the event type
+BASE_FIELDS = ("v", "type", "ts", "severity", "ip", "port", "user")
+
+
+def encode_ndjson(event):
+    return (json.dumps(event, separators=(",", ":")) + "\n").encode()
+
+
+def encode_binary(event):
+    # 4 byte big-endian length followed by the JSON payload
+    payload = json.dumps(event, separators=(",", ":")).encode()
+    return struct.pack("!I", len(payload)) + payload
+
+
+# consumer not connected yet or gone away, retried quietly on the next flush
+QUIET_ERRORS = (errno.ENXIO, errno.ENOENT, errno.ECONNREFUSED, errno.EPIPE, errno.ECONNRESET)
+
+ENCODERS = {
+    "ndjson": encode_ndjson,
+    "binary": encode_binary,
+}
+
+
+class EventWriter:
+    # buffers encoded events and flushes them on a background thread with
+    # non-blocking writes, so a slow or missing consumer never stalls the parser
+    def __init__(self, target="stdout", format="ndjson", flush_interval=0.5, max_buffer=4 * 1024 * 1024):
+        if format not in ENCODERS:
+            raise ValueError(f"unknown output format: {format}")
+        if target != "stdout" and not target.startswith(("unix:", "fifo:")):
+            raise ValueError(f"unknown output target: {target}")
+        self.target = target
+        self.encode = ENCODERS[format]
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.records = deque()
+        self.buffered = 0
+        # tail of a record the consumer has only partly received, must go out first
+        self.partial = b""
+        self.written = 0
+        self.dropped = 0
+        self._fd = None
+        self._sock = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="event-output", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._thread.join(timeout)
+        self._close()
+
+    def write(self, event):
+        record = dict.fromkeys(BASE_FIELDS)
+        record.update(event)
+        record["v"] = SCHEMA_VERSION
+        data = self.encode(record)
+        with self._lock:
+            # drop whole records rather than cut into the stream
+            if self.buffered + len(data) > self.max_buffer:
+                self.dropped += 1
+                return
+            self.records.append(data)
+            self.buffered += len(data)
+
+    def _open(self):
+        if self.target == "stdout":
+            try:
+                # a separate open file description, so O_NONBLOCK does not leak
+                # to stderr when fd 1 and fd 2 share one (TTY, systemd)
+                self._fd = os.open("/proc/self/fd/1", os.O_WRONLY | os.O_APPEND)
+            except OSError:
+                # sockets such as journald's stdout cannot be reopened: keep a
+                # blocking dup, writes only ever happen on the flush thread
+                self._fd = os.dup(1)
+                return
+        elif self.target.startswith("unix:"):
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self._sock.connect(self.target[len("unix:"):])
+            except OSError:
+                self._sock.close()
+                self._sock = None
+                raise
+            self._fd = self._sock.fileno()
+        elif self.target.startswith("fifo:"):
+            # raises ENXIO until a reader has the FIFO open
+            self._fd = os.open(self.target[len("fifo:"):], os.O_WRONLY | os.O_NONBLOCK)
+        os.set_blocking(self._fd, False)
+
+    def _close(self):
+        # a new consumer must start on a record boundary
+        self.partial = b""
+        if self._sock:
+            self._sock.close()
+        elif self._fd is not None:
+            os.close(self._fd)
+        self._fd = None
+        self._sock = None
+
+    def flush(self):
+        try:
+            if self._fd is None:
+                self._open()
+        except OSError as e:
+            # no consumer yet, records stay buffered up to max_buffer
+            if e.errno not in QUIET_ERRORS:
+                print(f"⚠️ Event output error: {e}")
+            return
+
+        with self._lock:
+            records, self.records, self.buffered = self.records, deque(), 0
+        data = self.partial + b"".join(records)
+        if not data:
+            return
+
+        try:
+            sent = os.write(self._fd, data)
+        except BlockingIOError:
+            sent = 0
+        except OSError as e:
+            if e.errno not in QUIET_ERRORS:
+                print(f"⚠️ Event output error: {e}")
+            self._close()
+            sent = None
+        if sent is not None:
+            self.written += sent
+            if sent < len(self.partial):
+                self.partial = self.partial[sent:]
+            else:
+                # a record cut by the write becomes `partial`, fully sent ones are dropped
+                sent -= len(self.partial)
+                self.partial = b""
+                while sent > 0:
+                    record = records.popleft()
+                    if sent < len(record):
+                        self.partial = record[sent:]
+                    sent -= len(record)
+
+        # unsent records go back in front of anything written meanwhile
+        with self._lock:
+            records.extend(self.records)
+            self.records = records
+            self.buffered = sum(len(record) for record in records)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.flush()
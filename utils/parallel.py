@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from utils.parse import classify_lines
+
+
+def _classify_chunk(name, start, end):
+    # runs in a worker: read the chunk straight from shared memory, only the
+    # (usually few) matching lines are pickled back
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        text = bytes(shm.buf[start:end]).decode("utf-8", "replace")
+    finally:
+        shm.close()
+    return classify_lines(text.split("\n"))
+
+
+def split_chunks(data, chunk_bytes):
+    # (start, end) offsets of line-aligned chunks of roughly chunk_bytes each
+    chunks = []
+    start = 0
+    while start < len(data):
+        newline = data.find(b"\n", start + chunk_bytes)
+        end = len(data) if newline == -1 else newline + 1
+        chunks.append((start, end))
+        start = end
+    return chunks
+
+
+class ParallelClassifier:
+    # classifies large batches of complete lines in a process pool, results
+    # come back in input order so stateful handling stays deterministic
+    def __init__(self, workers=None, chunk_bytes=256 * 1024, min_bytes=1024 * 1024):
+        self.workers = workers or os.cpu_count()
+        self.chunk_bytes = chunk_bytes
+        self.min_bytes = min_bytes
+        self.pool = None
+        self.shm = None
+
+    def start(self):
+        # forkserver: workers (including replacements for dead ones) are forked
+        # from a clean single-threaded server, never from the monitor, which by
+        # then runs sink, store, output and observer threads
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context("forkserver"))
+            # bring the workers up now rather than on the first large drain
+            list(self.pool.map(abs, range(self.workers)))
+        return self
+
+    def wants(self, data):
+        return len(data) >= self.min_bytes
+
+    def _buffer(self, size):
+        # one shared buffer, reused across batches and grown when needed
+        if self.shm is None or self.shm.size < size:
+            self._release()
+            self.shm = shared_memory.SharedMemory(create=True, size=max(size, 2 * self.min_bytes))
+        return self.shm
+
+    def classify(self, data):
+        self.start()
+        shm = self._buffer(len(data))
+        shm.buf[:len(data)] = data
+        chunks = split_chunks(data, self.chunk_bytes)
+        results = self.pool.map(
+            _classify_chunk,
+            [shm.name] * len(chunks),
+            [start for start, _ in chunks],
+            [end for _, end in chunks],
+        )
+
+        classified = []
+        for chunk in results:
+            classified.extend(chunk)
+        return classified
+
+    def _release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        self._release()
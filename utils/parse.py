@@ -0,0 +1,40 @@
+import re
+from utils.events import SESSION_CLOSE, LOGIN_SUCCESS, LOGIN_FAILED
+
+# regex patterns
+SUCCESS_REGEX = re.compile(
+    r"Accepted (password|publickey|keyboard-interactive) for (\S+) from ([\d\.]+) port (\d+)"
+)
+FAIL_REGEX = re.compile(
+    r"(Failed password|Invalid user) for (\S+) from ([\d\.]+) port (\d+)"
+)
+CLOSE_REGEX = re.compile(
+    r"(Disconnected from|Connection closed by).*?([\d\.]+) port (\d+)"
+)
+
+
+def classify_line(line):
+    # stateless part of parsing: (event type, regex groups) or None
+    close_match = CLOSE_REGEX.search(line)
+    if close_match:
+        return SESSION_CLOSE, close_match.groups()
+
+    success_match = SUCCESS_REGEX.search(line)
+    if success_match:
+        return LOGIN_SUCCESS, success_match.groups()
+
+    fail_match = FAIL_REGEX.search(line)
+    if fail_match:
+        return LOGIN_FAILED, fail_match.groups()
+
+    return None
+
+
+def classify_lines(lines):
+    # only matching lines are returned, in input order
+    classified = []
+    for line in lines:
+        match = classify_line(line.strip())
+        if match:
+            classified.append(match)
+    return classified
@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def consume(self, tokens=1):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+
+class KeyedLimiter:
+    # one token bucket per key, least recently used keys are evicted past max_keys
+    def __init__(self, rate, capacity, max_keys=10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+
+    def consume(self, key, tokens=1):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.capacity)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket.consume(tokens)
+
+
+class DedupCache:
+    def __init__(self, ttl, max_keys=10000):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.expiry = OrderedDict()
+
+    def seen(self, key):
+        # True if `key` was recorded within the last ttl seconds, records it otherwise
+        now = time.monotonic()
+        while self.expiry:
+            _, expires = next(iter(self.expiry.items()))
+            if expires > now and len(self.expiry) <= self.max_keys:
+                break
+            self.expiry.popitem(last=False)
+
+        if key in self.expiry:
+            return True
+        self.expiry[key] = now + self.ttl
+        return False
+
+
+class AlertLimiter:
+    # global + per-IP token buckets and a dedup cache on (event type, ip, user);
+    # types in `exempt` skip everything, severities in `unlimited` skip the buckets
+    # but are still deduplicated
+    def __init__(self, global_rate=1.0, global_burst=20, per_ip_rate=0.1, per_ip_burst=5,
+                 dedup_ttl=300, max_keys=10000, exempt=(), unlimited=("critical",)):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.per_ip = KeyedLimiter(per_ip_rate, per_ip_burst, max_keys)
+        self.dedup = DedupCache(dedup_ttl, max_keys)
+        self.exempt = set(exempt)
+        self.unlimited = set(unlimited)
+        self.suppressed = {}
+
+    def allow(self, event):
+        event = event or {}
+        event_type = event.get("type")
+        if event_type in self.exempt:
+            return True
+
+        key = (event_type, event.get("ip"), event.get("user"))
+        if event.get("severity") in self.unlimited:
+            allowed = not self.dedup.seen(key)
+        else:
+            allowed = (
+                not self.dedup.seen(key)
+                and self.per_ip.consume(event.get("ip"))
+                and self.global_bucket.consume()
+            )
+        if not allowed:
+            self.suppressed[event_type] = self.suppressed.get(event_type, 0) + 1
+        return allowed
+
+    def take_suppressed(self):
+        # counts suppressed since the last delivered alert, reset on read
+        suppressed, self.suppressed = self.suppressed, {}
+        return suppressed
@@ -0,0 +1,13 @@
+def check_rule(rule, kind, integer=False):
+    # shared by sketch and geoip rules: a copy of `rule` with a name and a positive
+    # threshold, or ValueError so a config mistake stops startup instead of raising
+    # KeyError on the first failed login
+    rule = dict(rule)
+    name = rule.get("name")
+    if not name:
+        raise ValueError(f"{kind} rule {rule} has no name")
+    threshold = rule.get("threshold")
+    if isinstance(threshold, bool) or not isinstance(threshold, int if integer else (int, float)) or threshold <= 0:
+        expected = "integer" if integer else "number"
+        raise ValueError(f"{kind} rule {name}: threshold must be a positive {expected}, got {threshold!r}")
+    return rule
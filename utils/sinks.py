@@ -0,0 +1,253 @@
+import json
+import queue
+import smtplib
+import socket
+import threading
+import time
+import urllib.request
+from utils.ratelimit import TokenBucket
+from utils.events import LOGIN_SUCCESS
+
+# syslog facility / severity codes (RFC 5424)
+SYSLOG_FACILITIES = {"auth": 4, "authpriv": 10, "daemon": 3, "local0": 16, "user": 1}
+SYSLOG_SEVERITIES = {"critical": 2, "warning": 4, "notice": 5, "info": 6}
+
+
+def describe(alert):
+    # subject line including alerts that were rate limited before this one
+    suppressed = alert.get("suppressed", 0)
+    if suppressed:
+        return f"{alert['subject']} (+{suppressed} suppressed)"
+    return alert["subject"]
+
+
+class CircuitBreaker:
+    # closed -> open after `failure_threshold` consecutive failures,
+    # open -> half-open once `reset_timeout` seconds have passed
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        return self.state != "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class AlertSink:
+    name = "sink"
+
+    def __init__(self, batch_size=10, flush_interval=1.0, max_retries=3,
+                 backoff=1.0, max_backoff=30.0, queue_size=1000,
+                 failure_threshold=5, reset_timeout=60, rate=None, burst=None,
+                 exempt=(LOGIN_SUCCESS,)):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        # per-recipient limit, alert types in `exempt` and critical alerts are never limited
+        self.limiter = TokenBucket(rate, burst or rate) if rate else None
+        self.exempt = set(exempt)
+        self.sent = 0
+        self.dropped = 0
+        self.suppressed = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"sink-{self.name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def submit(self, alert):
+        event = alert.get("event") or {}
+        limited = event.get("type") not in self.exempt and event.get("severity") != "critical"
+        if self.limiter and limited and not self.limiter.consume():
+            self.suppressed += 1
+            return
+        if self.suppressed:
+            # carry what this sink skipped into the next alert it delivers
+            alert = dict(alert, suppressed=alert.get("suppressed", 0) + self.suppressed)
+            self.suppressed = 0
+
+        # never block the caller: a full queue means the sink is too slow
+        try:
+            self.queue.put_nowait(alert)
+        except queue.Full:
+            self.dropped += 1
+
+    def _next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._deliver(batch)
+
+    def _deliver(self, batch):
+        batch = list(batch)
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                break
+            size = len(batch)
+            try:
+                self.send_batch(batch)
+                self.breaker.record_success()
+                self.sent += size
+                return
+            except Exception as e:
+                # sinks that deliver one alert at a time drop the delivered ones
+                # from `batch` before failing, only the rest is retried
+                self.sent += size - len(batch)
+                if not batch:
+                    return
+                self.breaker.record_failure()
+                print(f"⚠️ {self.name} sink failed (attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    # exponential backoff, cut short on shutdown
+                    self._stop.wait(min(self.backoff * 2 ** attempt, self.max_backoff))
+
+        self.dropped += len(batch)
+        print(f"⚠️ {self.name} sink dropped {len(batch)} alert(s) (circuit {self.breaker.state})")
+
+    def send_batch(self, batch):
+        raise NotImplementedError
+
+
+class EmailSink(AlertSink):
+    name = "email"
+
+    def __init__(self, email_cfg, build_message, **options):
+        super().__init__(**options)
+        self.email_cfg = email_cfg
+        self.build_message = build_message
+
+    def send_batch(self, batch):
+        # one SMTP session for the whole batch
+        server = smtplib.SMTP(self.email_cfg["smtp_server"], self.email_cfg["smtp_port"], timeout=30)
+        try:
+            server.starttls()
+            server.login(self.email_cfg["sender_email"], self.email_cfg["app_password"])
+            while batch:
+                alert = batch[0]
+                server.send_message(self.build_message(describe(alert), alert["message"], alert["is_html"]))
+                print(f"✅ Email sent: {describe(alert)}")
+                # delivered, a retry after a later failure must not send it again
+                batch.pop(0)
+        finally:
+            server.quit()
+
+
+class WebhookSink(AlertSink):
+    name = "webhook"
+
+    def __init__(self, url, headers=None, timeout=5, **options):
+        super().__init__(**options)
+        self.url = url
+        self.headers = {"Content-Type": "application/json"}
+        self.headers.update(headers or {})
+        self.timeout = timeout
+
+    def send_batch(self, batch):
+        # Slack/Teams incoming webhooks render `text`, the rest is for custom receivers
+        payload = {
+            "text": "\n".join(describe(alert) for alert in batch),
+            "alerts": [
+                {"subject": alert["subject"], "event": alert["event"], "suppressed": alert.get("suppressed", 0)}
+                for alert in batch
+            ],
+        }
+        request = urllib.request.Request(
+            self.url, data=json.dumps(payload).encode(), headers=self.headers, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SyslogSink(AlertSink):
+    name = "syslog"
+
+    def __init__(self, address="/dev/log", facility="auth", tag="ssh-monitor", **options):
+        super().__init__(**options)
+        self.address = tuple(address) if isinstance(address, (list, tuple)) else address
+        self.facility = SYSLOG_FACILITIES.get(facility, SYSLOG_FACILITIES["auth"])
+        self.tag = tag
+
+    def format(self, alert):
+        severity = (alert["event"] or {}).get("severity", "notice")
+        priority = self.facility * 8 + SYSLOG_SEVERITIES.get(severity, 5)
+        details = json.dumps(alert["event"]) if alert["event"] else ""
+        return f"<{priority}>{self.tag}: {describe(alert)} {details}".strip().encode()
+
+    def send_batch(self, batch):
+        family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.connect(self.address)
+            for alert in batch:
+                sock.send(self.format(alert))
+
+
+class JsonlSink(AlertSink):
+    name = "jsonl"
+
+    def __init__(self, path, **options):
+        super().__init__(**options)
+        self.path = path
+
+    def send_batch(self, batch):
+        lines = "".join(
+            json.dumps({
+                "ts": alert["ts"],
+                "subject": alert["subject"],
+                "event": alert["event"],
+                "suppressed": alert.get("suppressed", 0),
+            }) + "\n"
+            for alert in batch
+        )
+        with open(self.path, "a") as f:
+            f.write(lines)
+
+
+SINK_TYPES = {
+    "webhook": WebhookSink,
+    "syslog": SyslogSink,
+    "jsonl": JsonlSink,
+}
@@ -0,0 +1,199 @@
+import hashlib
+import math
+from array import array
+from collections import OrderedDict
+from utils.rules import check_rule
+
+# 2^-r lookup for HyperLogLog estimates
+POW2 = [2.0 ** -r for r in range(66)]
+
+
+def hash64(item):
+    return int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    # distinct count in 2^precision bytes, standard error ~1.04 / sqrt(2^precision)
+    def __init__(self, precision=10):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        # running sum of 2^-register and number of empty registers, so count() is O(1)
+        self.total = float(self.size)
+        self.zeros = self.size
+
+    def add(self, item):
+        # True if a register changed, i.e. the estimate may have moved
+        h = hash64(item)
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        old = self.registers[index]
+        if rank > old:
+            self.registers[index] = rank
+            self.total += POW2[rank] - POW2[old]
+            self.zeros -= old == 0
+            return True
+        return False
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        self.total = sum(map(POW2.__getitem__, self.registers))
+        self.zeros = self.registers.count(0)
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / self.total
+        zeros = self.zeros
+        if estimate <= 2.5 * m and zeros:
+            # linear counting is more accurate for small cardinalities
+            return m * math.log(m / zeros)
+        return estimate
+
+
+class CountMinSketch:
+    # frequency estimates that never undercount, overcount bounded by total * e / width
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("I", bytes(4 * width)) for _ in range(depth)]
+
+    def _indexes(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, item, count=1, indexes=None):
+        for row, index in zip(self.rows, indexes or self._indexes(item)):
+            row[index] += count
+
+    def estimate(self, item, indexes=None):
+        return min(row[index] for row, index in zip(self.rows, indexes or self._indexes(item)))
+
+
+class WindowedDistinct:
+    # distinct values per key over a rolling window, kept as a ring of
+    # per-slot HyperLogLogs; at most max_keys keys (least recently used evicted)
+    def __init__(self, window=600, slots=5, precision=10, max_keys=1000):
+        self.slot_length = window / slots
+        self.slots = slots
+        self.precision = precision
+        self.max_keys = max_keys
+        self.keys = OrderedDict()
+
+    def _slot(self, ts):
+        return int(ts // self.slot_length)
+
+    def add(self, key, value, ts):
+        # returns the distinct estimate for `key` over the window
+        slot = self._slot(ts)
+        state = self.keys.get(key)
+        if state is None:
+            state = self.keys[key] = {"slots": {}, "merged": HyperLogLog(self.precision)}
+            if len(self.keys) > self.max_keys:
+                self.keys.popitem(last=False)
+        else:
+            self.keys.move_to_end(key)
+
+        # `merged` is the union of the live slots, updated in place on add
+        # and rebuilt only when a slot falls out of the window
+        ring = state["slots"]
+        if slot not in ring:
+            expired = [s for s in ring if s <= slot - self.slots]
+            for old in expired:
+                del ring[old]
+            if expired:
+                state["merged"] = HyperLogLog(self.precision)
+                for sketch in ring.values():
+                    state["merged"].merge(sketch)
+            ring[slot] = HyperLogLog(self.precision)
+        ring[slot].add(value)
+        state["merged"].add(value)
+        return state["merged"].count()
+
+
+class WindowedHeavyHitters:
+    # per-key counts over a rolling window (one count-min sketch per slot)
+    # plus a small candidate list of the top_k keys
+    def __init__(self, window=600, slots=5, width=2048, depth=4, top_k=10):
+        self.slot_length = window / slots
+        self.slots = slots
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.ring = {}
+        self.candidates = {}
+
+    def add(self, key, ts):
+        slot = int(ts // self.slot_length)
+        if slot not in self.ring:
+            for old in [s for s in self.ring if s <= slot - self.slots]:
+                del self.ring[old]
+            self.ring[slot] = CountMinSketch(self.width, self.depth)
+        # every slot has the same shape, so the key is hashed once
+        indexes = self.ring[slot]._indexes(key)
+        self.ring[slot].add(key, indexes=indexes)
+
+        count = self.estimate(key, indexes)
+        self.candidates[key] = count
+        if len(self.candidates) > self.top_k:
+            del self.candidates[min(self.candidates, key=self.candidates.get)]
+        return count
+
+    def estimate(self, key, indexes=None):
+        if not self.ring:
+            return 0
+        indexes = indexes or next(iter(self.ring.values()))._indexes(key)
+        return sum(sketch.estimate(key, indexes) for sketch in self.ring.values())
+
+    def top(self):
+        counts = {key: self.estimate(key) for key in self.candidates}
+        return sorted(((key, n) for key, n in counts.items() if n), key=lambda kv: -kv[1])
+
+
+def check_sketch_rule(rule):
+    rule = check_rule(rule, "sketch")
+    if rule.get("key") not in ("user", "ip"):
+        raise ValueError(f"sketch rule {rule['name']}: key must be 'user' or 'ip', got {rule.get('key')!r}")
+    return rule
+
+
+class SketchAnalytics:
+    # fixed-memory analytics over failed logins: distinct IPs per user,
+    # distinct users per IP, and the most targeted users / most active IPs
+    def __init__(self, window=600, slots=5, precision=10, max_keys=1000,
+                 cms_width=2048, cms_depth=4, top_k=10, rules=()):
+        self.window = window
+        self.ips_per_user = WindowedDistinct(window, slots, precision, max_keys)
+        self.users_per_ip = WindowedDistinct(window, slots, precision, max_keys)
+        self.top_users = WindowedHeavyHitters(window, slots, cms_width, cms_depth, top_k)
+        self.top_ips = WindowedHeavyHitters(window, slots, cms_width, cms_depth, top_k)
+        self.rules = [check_sketch_rule(rule) for rule in rules]
+        self.fired = {}
+
+    def add_failure(self, ip, user, ts):
+        # returns the rules crossed by this event as (rule, key, estimate)
+        estimates = {
+            "user": self.ips_per_user.add(user, ip, ts),
+            "ip": self.users_per_ip.add(ip, user, ts),
+        }
+        self.top_users.add(user, ts)
+        self.top_ips.add(ip, ts)
+
+        triggered = []
+        for rule in self.rules:
+            key = user if rule["key"] == "user" else ip
+            if rule.get("match") not in (None, key):
+                continue
+            estimate = estimates[rule["key"]]
+            fired_key = (rule["name"], key)
+            # fire once per key per window
+            if estimate >= rule["threshold"] and ts - self.fired.get(fired_key, -math.inf) >= self.window:
+                self.fired[fired_key] = ts
+                triggered.append((rule, key, int(estimate)))
+
+        if len(self.fired) > self.ips_per_user.max_keys:
+            self.fired = {k: t for k, t in self.fired.items() if ts - t < self.window}
+        return triggered
@@ -0,0 +1,209 @@
+import argparse
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.request import pathname2url
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL,
+    type INTEGER NOT NULL,
+    ip TEXT,
+    port INTEGER,
+    user TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_ip_ts ON events (ip, ts);
+CREATE INDEX IF NOT EXISTS events_user_ts ON events (user, ts);
+"""
+
+# event types are stored as small integers to keep rows compact
+TYPE_CODES = {
+    "session_close": 0,
+    "login_success": 1,
+    "login_failed": 2,
+    "multiple_failures": 3,
+    "sketch_rule": 4,
+    "geo_rule": 5,
+}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class EventStore:
+    # SQLite in WAL mode, rows are queued and committed in batches on a writer thread
+    def __init__(self, path, batch_size=500, flush_interval=1.0, retention_days=30,
+                 compact_interval=3600, queue_size=100000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.compact_interval = compact_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        # auto_vacuum only takes effect on a fresh database, before the first table
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def start(self):
+        conn = self.connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+        self._thread = threading.Thread(target=self._run, name="event-store", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def append(self, event):
+        row = (
+            event["ts"],
+            TYPE_CODES.get(event["type"], -1),
+            event.get("ip"),
+            event.get("port"),
+            event.get("user"),
+            event.get("method") or event.get("reason") or event.get("rule"),
+        )
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = self.connect()
+        last_compact = time.monotonic()
+        try:
+            # prune what earlier runs left behind before the first interval passes
+            self.compact(conn)
+            while not (self._stop.is_set() and self.queue.empty()):
+                batch = self._next_batch()
+                if batch:
+                    with conn:
+                        conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)", batch)
+                    self.written += len(batch)
+
+                if time.monotonic() - last_compact >= self.compact_interval:
+                    self.compact(conn)
+                    last_compact = time.monotonic()
+        except sqlite3.Error as e:
+            print(f"⚠️ Event store stopped: {e}")
+        finally:
+            conn.close()
+
+    def compact(self, conn):
+        # drop rows past retention and hand the freed pages back to the filesystem
+        cutoff = time.time() - self.retention_days * 86400
+        with conn:
+            deleted = conn.execute("DELETE FROM events WHERE ts < ?", (cutoff,)).rowcount
+        if deleted:
+            conn.execute("PRAGMA incremental_vacuum")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            print(f"🧹 Event store pruned {deleted} event(s) older than {self.retention_days} days")
+
+    def query(self, ip=None, user=None, event_type=None, since=None, until=None, limit=100):
+        clauses, params = [], []
+        if ip:
+            clauses.append("ip = ?")
+            params.append(ip)
+        if user:
+            clauses.append("user = ?")
+            params.append(user)
+        if event_type:
+            clauses.append("type = ?")
+            params.append(TYPE_CODES.get(event_type, -1))
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+
+        sql = "SELECT ts, type, ip, port, user, detail FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+
+        # read-only, so a wrong path fails instead of creating an empty database
+        conn = sqlite3.connect(f"file:{pathname2url(self.path)}?mode=ro", uri=True, timeout=30)
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+        return [
+            {"ts": ts, "type": TYPE_NAMES.get(code, "unknown"), "ip": ip, "port": port,
+             "user": user, "detail": detail}
+            for ts, code, ip, port, user, detail in rows
+        ]
+
+
+def parse_time(value):
+    # relative ("30m", "2h", "7d") or absolute ("2024-05-01", "2024-05-01 13:00")
+    if value is None:
+        return None
+    if value[-1:] in UNITS and value[:-1].isdigit():
+        return time.time() - int(value[:-1]) * UNITS[value[-1]]
+    return datetime.fromisoformat(value).timestamp()
+
+
+def query_main(argv, path):
+    parser = argparse.ArgumentParser(prog="ssh-monitor query", description="Query stored SSH events")
+    parser.add_argument("--ip", help="source IP address")
+    parser.add_argument("--user", help="username")
+    parser.add_argument("--type", choices=sorted(TYPE_CODES), help="event type")
+    parser.add_argument("--since", help="start time, e.g. 2h, 7d or 2024-05-01")
+    parser.add_argument("--until", help="end time, same format as --since")
+    parser.add_argument("--limit", type=int, default=100, help="max events to show (default 100)")
+    parser.add_argument("--json", action="store_true", help="print events as JSON lines")
+    args = parser.parse_args(argv)
+
+    try:
+        since, until = parse_time(args.since), parse_time(args.until)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        events = EventStore(path).query(args.ip, args.user, args.type, since, until, args.limit)
+    except sqlite3.Error as e:
+        print(f"⚠️ Cannot read event store {path}: {e}")
+        return 1
+    for event in events:
+        if args.json:
+            print(json.dumps(event))
+        else:
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event["ts"]))
+            print(f"{when}  {event['type']:<17} {event['ip'] or '-':<15} "
+                  f"{event['port'] or '-':<6} {event['user'] or '-':<16} {event['detail'] or ''}")
+    return 0
@@ -0,0 +1,42 @@
+import os
+
+
+class LogTail:
+    # keeps the log open between reads and returns only complete lines appended
+    # since the last read; a trailing partial line is held back until its newline
+    # arrives. Rotation (new inode) and truncation reopen the file from the top
+    def __init__(self, path, from_end=True):
+        self.path = path
+        self.partial = b""
+        self.file = open(path, "rb")
+        if from_end:
+            self.file.seek(0, 2)
+
+    def reopen_if_rotated(self):
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        opened = os.fstat(self.file.fileno())
+        if current.st_ino != opened.st_ino or current.st_size < self.file.tell():
+            # logrotate replaced or truncated the file, start the new one from the top
+            self.file.close()
+            self.file = open(self.path, "rb")
+            self.partial = b""
+
+    def read(self):
+        # everything appended since the last call, in one read, up to the last newline
+        data = self.file.read()
+        if not data:
+            self.reopen_if_rotated()
+            data = self.file.read()
+            if not data:
+                return b""
+
+        data = self.partial + data
+        end = data.rfind(b"\n") + 1
+        data, self.partial = data[:end], data[end:]
+        return data
+
+    def close(self):
+        self.file.close()